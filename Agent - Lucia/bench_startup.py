@@ -0,0 +1,45 @@
+"""
+冷启动耗时分析：每个服务模块的 import 开销 + 每个服务的初始化耗时 + 并发预热的总耗时。
+用法: python bench_startup.py            # 并发预热 (和线上启动一致)
+      python bench_startup.py --sequential  # 逐个初始化，看每个服务的独立成本
+"""
+import time
+import asyncio
+import argparse
+import importlib
+
+SERVICE_MODULES = ["services.gateway", "services.llm", "services.notification", "services.search", "services.tokenizer", "services.vector"]
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure per-service cold-start cost.")
+    parser.add_argument("--sequential", action="store_true", help="逐个初始化而不是并发预热")
+    args = parser.parse_args()
+
+    print("📦 Import cost")
+    for mod in SERVICE_MODULES:
+        start = time.perf_counter()
+        importlib.import_module(mod)
+        print(f"   {mod:24s} {time.perf_counter() - start:6.2f}s")
+
+    from services.registry import registry
+
+    start = time.perf_counter()
+    if args.sequential:
+        for name in list(registry.report()["pending"]):
+            try:
+                registry.get(name)
+            except Exception as e:
+                print(f"❌ {name}: {e}")
+    else:
+        asyncio.run(registry.warmup())
+    total = time.perf_counter() - start
+
+    print("🚀 Init cost")
+    for name, cost in sorted(registry.timings.items(), key=lambda x: -x[1]):
+        print(f"   {name:24s} {cost:6.2f}s")
+    for name, err in registry.errors.items():
+        print(f"   {name:24s} FAILED: {err}")
+    print(f"⏱️ Total ({'sequential' if args.sequential else 'concurrent'}): {total:.2f}s")
+
+if __name__ == "__main__":
+    main()
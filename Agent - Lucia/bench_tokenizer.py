@@ -0,0 +1,64 @@
+"""
+jieba 分词微基准：冷启动 (建前缀词典) / 首次分词 / 热分词 / LRU 命中。
+用法: python bench_tokenizer.py [--rounds 2000] [--no-disk-cache]
+--no-disk-cache 会先删掉 jieba 的词典缓存文件，模拟全新机器上的冷启动。
+"""
+import os
+import time
+import argparse
+from config import settings
+
+# 典型的中英混杂 IT 问题
+QUERIES = [
+    "VPN连接失败 GlobalProtect 提示网关不可达",
+    "域账号锁定 无法登录 Windows",
+    "Outlook 收不到邮件 OST 文件损坏",
+    "打印机脱机 网络打印机 无法添加",
+    "Teams 会议无声音 耳机 蓝牙",
+    "电脑蓝屏 错误代码 IRQL_NOT_LESS_OR_EQUAL",
+    "BitLocker 恢复密钥 开机要求输入",
+    "Wi-Fi 频繁掉线 网卡驱动 更新",
+    "OneDrive 同步失败 SharePoint 权限",
+    "多因素认证 MFA 手机更换 重新绑定",
+]
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark for the sparse-query tokenizer.")
+    parser.add_argument("--rounds", type=int, default=2000)
+    parser.add_argument("--no-disk-cache", action="store_true")
+    args = parser.parse_args()
+
+    from services.tokenizer import Tokenizer
+
+    if args.no_disk_cache:
+        cache_dir = settings.JIEBA_CACHE_DIR
+        for name in os.listdir(cache_dir) if os.path.isdir(cache_dir) else []:
+            if name.startswith("jieba") and name.endswith(".cache"):
+                os.remove(os.path.join(cache_dir, name))
+
+    start = time.perf_counter()
+    tok = Tokenizer()
+    print(f"🧊 Init (prefix dict + user dict): {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+    start = time.perf_counter()
+    tok.tokenize(QUERIES[0])
+    print(f"🥶 First tokenize:                 {(time.perf_counter() - start) * 1000:8.2f} ms")
+
+    start = time.perf_counter()
+    for i in range(args.rounds):
+        " ".join(tok._jieba.cut(QUERIES[i % len(QUERIES)]))
+    per_call = (time.perf_counter() - start) / args.rounds
+    print(f"🔥 Warm jieba.cut:                  {per_call * 1e6:8.1f} µs/query")
+
+    start = time.perf_counter()
+    for i in range(args.rounds):
+        tok.tokenize(QUERIES[i % len(QUERIES)])
+    per_call = (time.perf_counter() - start) / args.rounds
+    print(f"⚡ LRU tokenize:                    {per_call * 1e6:8.1f} µs/query | {tok.cache.stats()}")
+
+    print("\n示例分词:")
+    for q in QUERIES[:3]:
+        print(f"   {q} -> {tok.tokenize(q)}")
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import os
+from typing import Dict
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 # 自动计算 .env 的绝对路径（防止 "File Not Found"）
@@ -21,21 +22,95 @@ class Settings(BaseSettings):
     # === 2. 业务参数 (有默认值) ===
     INDEX_NAME: str = "pinecone-study"
     BM25_PATH: str = "/Users/clarence/Desktop/RAG项目/RAG Base/bm25_model.json"
+    BM25_BIN_PATH: str = ""  # 二进制 BM25 模型，默认与 BM25_PATH 同名 .bin
+    # IT 领域自定义词典 (it_userdict.txt)：必须和建索引 (Pinecone 稀疏向量 + BM25 doc_freq) 用的词典一致，
+    # 现有索引用的是 jieba 默认词典，所以默认不加载；用它重建索引后再设置
+    JIEBA_USER_DICT: str = ""
+    JIEBA_CACHE_DIR: str = os.path.join(BASE_DIR, "cache")             # jieba 前缀词典缓存目录
+    TOKENIZE_CACHE_SIZE: int = 20000
     
     SCORE_FLOOR: float = 0.35
     HIGH_CONFIDENCE: float = 0.60
     MARGIN_FLOOR: float = 0.03
+    # 快速通道：Top1 够高且和 Top2 拉得开时，生成完直接返回，阅卷放到后台 (services/posthoc.py)
+    FAST_PATH_ENABLED: bool = True
+    FAST_PATH_CONFIDENCE: float = 0.75
+    FAST_PATH_MARGIN: float = 0.05
+    # 投机搜索：Top1 落在 [SPECULATIVE_LOW, SPECULATIVE_HIGH) 的风险区间时，RAG 生成和 Tavily 搜索并发跑
+    # 阅卷不通过就直接用已经拿到的搜索结果，兜底路径的耗时从 "两段相加" 变成 "两段取最大"
+    SPECULATIVE_SEARCH_ENABLED: bool = True
+    SPECULATIVE_LOW: float = 0.35
+    SPECULATIVE_HIGH: float = 0.60
+    SPECULATIVE_GRACE: float = 1.0     # 生成结束后最多再等搜索多久 (秒)，超时就放弃投机结果
     TOP_K: int = 3
+    # 混合检索打分: native (dense+sparse 一次查询，Pinecone 点积) / convex (两路加权) / rrf (倒数排名融合)
+    FUSION_MODE: str = "native"
+    FUSION_ALPHA: float = 0.5          # convex 模式下 dense 的权重
+    RRF_K: int = 60
+    FUSION_CANDIDATES: int = 20        # 融合模式下每一路的召回深度
+    HYBRID_DENSE_WEIGHT: float = 1.0   # native 模式下 dense 向量权重
+    HYBRID_SPARSE_WEIGHT: float = 1.0  # native 模式下 BM25 稀疏向量权重
+    RETRIEVAL_BACKEND: str = "pinecone"                               # pinecone / local
+    LOCAL_INDEX_DIR: str = os.path.join(BASE_DIR, "cache", "kb_snapshot")  # export_snapshot.py 的输出目录
+    PINECONE_POOL_THREADS: int = 8     # Pinecone 连接池大小
+    PINECONE_TIMEOUT: float = 5.0      # 单次 query 超时 (秒)
+    PINECONE_SPARSE_INDEX: str = ""    # 融合模式的纯稀疏检索用的 sparse 索引；不配则融合时跳过 sparse 一路
+    TAVILY_BASE_URL: str = "https://api.tavily.com"  # bench_search.py 会指向本地替身服务
+    SEARCH_MAX_RESULTS: int = 3
+    SEARCH_CONCURRENCY: int = 8        # 同时在飞的 Tavily 请求上限 (= 连接池大小)
+    SEARCH_TIMEOUT: float = 10.0       # 读取超时 (秒)
+    SEARCH_CONNECT_TIMEOUT: float = 3.0
     
     LLM_MODEL: str = "qwen-max"
     ROUTER_MODEL: str = "qwen-turbo"
     EMBED_MODEL: str = "text-embedding-004"
+    # 重写 + 路由的执行方式: fused (一次 JSON 调用) / parallel (两次调用并发) / sequential (旧逻辑)
+    REWRITE_ROUTE_MODE: str = "fused"
+    EMBED_BATCH_MAX: int = 64        # 单次 embed_content 最多几条
+    EMBED_BATCH_WAIT_MS: float = 5.0 # 微批窗口
     LLM_BASE_URL: str = "https://dashscope.aliyuncs.com/compatible-mode/v1"
 
+    # LLM 网关 (services/gateway.py)
+    LLM_MAX_CONNECTIONS: int = 64       # httpx 连接池
+    LLM_MAX_KEEPALIVE: int = 32
+    LLM_KEEPALIVE_EXPIRY: float = 60.0
+    LLM_TIMEOUT: float = 60.0           # 读取超时 (秒)
+    LLM_CONNECT_TIMEOUT: float = 5.0
+    LLM_MAX_CONCURRENCY: int = 16       # 每个模型同时在飞的请求数
+    LLM_CONCURRENCY: Dict[str, int] = {"qwen-turbo": 32}  # 按模型覆盖，.env 里写 JSON
+    LLM_MAX_RETRIES: int = 3
+    LLM_RETRY_BASE_DELAY: float = 0.5   # 指数退避的基数 (秒)，实际等待在 [0, base * 2^n] 里随机
+    LLM_RETRY_MAX_DELAY: float = 20.0
+    LLM_HEDGE_ENABLED: bool = True      # ROUTER_MODEL 请求对冲
+    LLM_HEDGE_DELAY: float = 1.5        # 第一个请求这么久没回来就再发一个 (秒)，建议设在 P95 附近
+
     # === 3. 刚才报错缺失的字段 ===
     ENABLE_DEBUG: bool = False  # 如果 .env 里写 true，这里会自动变成 True
 
-    # === 4. Pydantic V2 新版配置写法 ===
+    # === 4. 缓存 ===
+    EMBED_CACHE_SIZE: int = 10000                                   # 进程内 LRU 条数
+    EMBED_CACHE_PATH: str = os.path.join(BASE_DIR, "cache", "embeddings.sqlite3")  # 置空则不落盘
+
+    # 语义答案缓存
+    SEMANTIC_CACHE_ENABLED: bool = True
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95   # 余弦相似度阈值
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 2000
+    SEMANTIC_CACHE_TTL: float = 86400.0      # 秒
+    SEMANTIC_CACHE_MAX_MB: int = 64          # 含向量矩阵 + 答案 + payload
+    KB_VERSION: str = ""                     # 重建 Pinecone 索引后改一下，缓存会整体失效
+
+    # Tavily 结果缓存 (故障高峰期大家问的都是同一件事)
+    SEARCH_CACHE_SIZE: int = 1000
+    SEARCH_CACHE_TTL: float = 600.0          # 秒；网上的信息会变，不宜太长
+
+    # === 5. HTTP 服务 (server.py) ===
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8000
+    MAX_INFLIGHT: int = 32        # 同时在跑的 graph 数量上限
+    QUEUE_TIMEOUT: float = 2.0    # 排队等待名额的最长时间 (秒)，超时返回 503
+    REQUEST_TIMEOUT: float = 60.0 # 单个请求的总超时 (秒)，超时返回 504
+
+    # === 6. Pydantic V2 新版配置写法 ===
     model_config = SettingsConfigDict(
         env_file=ENV_PATH,           # 强制读绝对路径
         env_file_encoding='utf-8',
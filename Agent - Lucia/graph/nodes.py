@@ -1,8 +1,13 @@
+import asyncio
+from typing import Optional
+from langgraph.config import get_stream_writer
 from schemas import AgentState
 from config import settings
 from services.llm import llm_service
 from services.vector import vec_service
 from services.search import search_service
+from services.semantic_cache import semantic_cache
+from services.posthoc import posthoc
 
 # --- 移植你的 Prompts 类 ---
 class Prompts:
@@ -20,6 +25,17 @@ class Prompts:
     2. "chat": 闲聊、问候、无关话题。
     输出格式：{"type": "rag", "reason": "..."}"""
 
+    SYSTEM_REWRITE_ROUTE = """你是一个专业的 IT 搜索优化专家兼意图分类助手。强制返回 JSON。
+    任务一 (query)：优化用户的输入，以便在 IT 知识库中进行检索。
+    1. 去除口语化词汇（如“那个”、“请问”、“救命啊”）。
+    2. 提取核心关键词，补充隐含的主语（如将“连不上”改为“VPN连接失败”）。
+    3. 转化为简练、专业的搜索短语。
+    4. 【重要】如果用户是在闲聊（如“你好”、“谢谢”），请原封不动地返回原文，不要修改。
+    任务二 (type)：
+    1. "rag": IT 故障、软件报错、账号问题、设备问题等业务问题。
+    2. "chat": 闲聊、问候、无关话题。
+    输出格式：{"query": "VPN连接失败", "type": "rag"}"""
+
     SYSTEM_RAG = """你是玛氏中国 IT 支持助手。你必须严格基于【知识库】回答。"""
     USER_RAG = """【知识库】\n{context}\n\n【用户问题】\n{question}\n\n【任务】\n仅使用知识库步骤回答。"""
 
@@ -33,6 +49,29 @@ class Prompts:
     SYSTEM_GRADER = """你是一个严格的阅卷老师。评估 AI 生成的答案是否出现了“幻觉”。
     必须返回 JSON：{"score": "yes", "reason": "..."} 或 {"score": "no", "reason": "..."}"""
 
+# --- 流式生成 ---
+
+async def _generate_streaming(source: str, system_prompt: str, user_prompt: str, temp: float = 0.2) -> str:
+    """
+    边生成边把 token 推给 stream_mode="custom" 的调用方，返回完整文本 (grader 仍然基于完整答案打分)。
+    source 用来告诉客户端 token 来自哪个分支 (rag / search / chat)。
+    """
+    writer = get_stream_writer()
+    parts = []
+    try:
+        async for token in llm_service.generate_stream(system_prompt, user_prompt, temp=temp):
+            parts.append(token)
+            writer({"source": source, "token": token})
+    except Exception as e:
+        if parts:
+            raise e
+        # 还没吐出任何 token 就失败了：退回带重试的非流式接口
+        print(f"⚠️ [Stream] {e} -> fallback to blocking generate")
+        ans = await llm_service.generate(system_prompt, user_prompt, temp=temp)
+        writer({"source": source, "token": ans})
+        return ans
+    return "".join(parts)
+
 # --- Nodes 实现 (Async) ---
 
 async def node_rewrite(state: AgentState):
@@ -58,6 +97,62 @@ async def node_router(state: AgentState):
         
     return {"route": route_type, "dense_vec": dense_vec}
 
+async def node_rewrite_route(state: AgentState):
+    """
+    重写 + 路由 + embedding 合并成一个节点，缩短 RAG 的关键路径：
+    - fused:    一次 JSON 调用同时拿到重写结果和意图
+    - parallel: 路由 (基于原始问题) 与重写并发；重写一返回就投机地启动 embedding
+    """
+    orig_q = state.get("original_question") or state["question"]
+    print(f"   [Rewrite] Original: {orig_q}")
+
+    if settings.REWRITE_ROUTE_MODE == "fused":
+        decision = await llm_service.rewrite_and_route(orig_q, Prompts.SYSTEM_REWRITE_ROUTE)
+        new_q, route_type = decision["query"], decision["type"]
+        print(f"   [Rewrite] Optimized: {new_q}")
+        print(f"   [Router] Decision: {route_type.upper()}")
+        dense_vec = await vec_service.embed_query_async(new_q) if route_type == "rag" else None
+        return {"question": new_q, "original_question": orig_q, "route": route_type, "dense_vec": dense_vec}
+
+    route_task = asyncio.create_task(llm_service.route_request(orig_q, Prompts.SYSTEM_ROUTER))
+    new_q = await llm_service.rewrite_query(orig_q, Prompts.SYSTEM_REWRITE)
+    print(f"   [Rewrite] Optimized: {new_q}")
+
+    # 投机 embedding：大部分流量是 rag，先跑起来，闲聊再丢掉
+    embed_task = asyncio.create_task(vec_service.embed_query_async(new_q))
+    decision = await route_task
+    route_type = decision.get("type", "rag")
+    print(f"   [Router] Decision: {route_type.upper()}")
+
+    if route_type != "rag":
+        embed_task.cancel()
+        return {"question": new_q, "original_question": orig_q, "route": route_type, "dense_vec": None}
+
+    dense_vec = await embed_task
+    return {"question": new_q, "original_question": orig_q, "route": route_type, "dense_vec": dense_vec}
+
+async def node_cache(state: AgentState):
+    """语义缓存：相似问题已经有通过阅卷的答案，就跳过检索/生成/阅卷"""
+    if not settings.SEMANTIC_CACHE_ENABLED:
+        return {"cache_hit": False}
+
+    hit = semantic_cache.lookup(state["dense_vec"], vec_service.kb_fingerprint())
+    if hit is None:
+        return {"cache_hit": False}
+
+    answer, documents, sim = hit
+    print(f"   [Cache] ⚡ Semantic hit (sim={sim:.4f}) -> skip RAG")
+    posthoc.record("cache")
+    writer = get_stream_writer()
+    writer({"source": "rag", "token": answer})
+    return {
+        "cache_hit": True,
+        "generation": answer,
+        "documents": documents,
+        "retrieval_quality": True,
+        "grade_status": "useful",
+    }
+
 async def node_retriever(state: AgentState):
     docs = await vec_service.hybrid_search_async(
         state["question"], 
@@ -66,12 +161,16 @@ async def node_retriever(state: AgentState):
     )
     return {"documents": docs}
 
+def _in_risky_band(s1: float) -> bool:
+    return settings.SPECULATIVE_SEARCH_ENABLED and settings.SPECULATIVE_LOW <= s1 < settings.SPECULATIVE_HIGH
+
 async def node_gate(state: AgentState):
     matches = state["documents"]
     
     if not matches:
         print("   [Gate] ❌ No documents retrieved.")
-        return {"retrieval_quality": False}
+        posthoc.record("search")
+        return {"retrieval_quality": False, "fast_path": False}
     
     s1 = float(matches[0].get("score", 0.0))
     s2 = float(matches[1].get("score", 0.0)) if len(matches) > 1 else 0.0
@@ -81,46 +180,121 @@ async def node_gate(state: AgentState):
     # 逻辑保持完全一致
     if s1 < settings.SCORE_FLOOR:
         print(f"   [Gate] 📉 Low Score ({s1:.4f} < {settings.SCORE_FLOOR}) -> Search")
-        return {"retrieval_quality": False}
+        posthoc.record("search")
+        return {"retrieval_quality": False, "fast_path": False}
+
+    # 快速通道：分数高且没有歧义，生成后不等阅卷
+    if settings.FAST_PATH_ENABLED and s1 >= settings.FAST_PATH_CONFIDENCE and (s1 - s2) >= settings.FAST_PATH_MARGIN:
+        print(f"   [Gate] ⏩ Unambiguous ({s1:.4f} >= {settings.FAST_PATH_CONFIDENCE}) -> FAST PATH")
+        posthoc.record("fast")
+        return {"retrieval_quality": True, "fast_path": True}
     
     if s1 >= settings.HIGH_CONFIDENCE:
         print(f"   [Gate] 🚀 High Confidence ({s1:.4f} >= {settings.HIGH_CONFIDENCE}) -> PASS")
-        return {"retrieval_quality": True}
+        posthoc.record("full")
+        return {"retrieval_quality": True, "fast_path": False, "speculative": False}
 
     if (s1 - s2) < settings.MARGIN_FLOOR:
         print(f"   [Gate] ⚠️ Ambiguous in Mid-Range -> Search")
-        return {"retrieval_quality": False}
+        posthoc.record("search")
+        return {"retrieval_quality": False, "fast_path": False}
     
     print(f"   [Gate] ✅ Quality Check Passed")
-    return {"retrieval_quality": True}
+    posthoc.record("full")
+    return {"retrieval_quality": True, "fast_path": False, "speculative": _in_risky_band(s1)}
+
+async def _speculative_search(question: str) -> Optional[str]:
+    """
+    投机搜索失败时返回 None，state 里不写 search_context，阅卷不通过时照常走 web_search；
+    不用 web_search_async，它失败时返回的 "网络搜索失败。" 会被当成搜索结果直接拿去生成
+    """
+    try:
+        return await search_service.search(question)
+    except Exception as e:
+        posthoc.record("speculative_failed")
+        print(f"   [Search] 🔮 Speculative search failed: {e}")
+        return None
 
 async def node_generate_rag(state: AgentState):
     blocks = [f"【故障场景】{m['metadata'].get('name')}\n【处理步骤】{m['metadata'].get('steps')}" for m in state["documents"]]
     context = "\n\n".join(blocks)
     
     user_p = Prompts.USER_RAG.format(context=context, question=state["question"])
-    ans = await llm_service.generate(Prompts.SYSTEM_RAG, user_p)
-    return {"generation": ans}
+    if not state.get("speculative"):
+        ans = await _generate_streaming("rag", Prompts.SYSTEM_RAG, user_p)
+        return {"generation": ans}
 
-async def node_grader(state: AgentState):
-    print("   [Grader] Checking for hallucinations...")
-    answer = state["generation"]
+    # 风险区间：搜索和生成同时跑，阅卷不通过时 search_context 已经就绪
+    print(f"   [Search] 🔮 Speculative search launched for: {state['question']}")
+    posthoc.record("speculative")
+    search_task = asyncio.create_task(_speculative_search(state["question"]))
+    try:
+        ans = await _generate_streaming("rag", Prompts.SYSTEM_RAG, user_p)
+    except BaseException:
+        search_task.cancel()
+        raise
+
+    done, _ = await asyncio.wait({search_task}, timeout=settings.SPECULATIVE_GRACE)
+    if not done:
+        # 搜索比生成慢太多就不等了，阅卷不通过时照常走 web_search
+        search_task.cancel()
+        posthoc.record("speculative_late")
+        print(f"   [Search] 🔮 Speculative search still running after {settings.SPECULATIVE_GRACE}s -> dropped")
+        return {"generation": ans}
+    search_context = search_task.result()
+    if search_context is None:
+        return {"generation": ans}
+    return {"generation": ans, "search_context": search_context}
+
+def _grader_input(state: AgentState) -> str:
     blocks = [m.get("metadata", {}).get("steps", "") for m in state["documents"]]
     context = "\n".join(blocks)
-    
-    user_content = f"【参考文档】\n{context}\n\n【生成答案】\n{answer}"
-    grade = await llm_service.route_request(user_content, Prompts.SYSTEM_GRADER)
-    score = grade.get("score", "yes")
+    return f"【参考文档】\n{context}\n\n【生成答案】\n{state['generation']}"
+
+def _cache_answer(state: AgentState):
+    if settings.SEMANTIC_CACHE_ENABLED:
+        docs = [{"score": float(m.get("score", 0.0)), "metadata": dict(m.get("metadata", {}))} for m in state["documents"]]
+        semantic_cache.put(state.get("dense_vec"), state["generation"], vec_service.kb_fingerprint(), payload=docs)
+
+async def node_grader(state: AgentState):
+    print("   [Grader] Checking for hallucinations...")
+    try:
+        grade = await llm_service.grade_answer(_grader_input(state), Prompts.SYSTEM_GRADER)
+    except Exception as e:
+        # 阅卷挂了：答案照常返回，但没阅过卷的答案不写语义缓存
+        print(f"   [Grader] ⚠️ Grader failed ({e}) -> answer kept, not cached")
+        posthoc.record("grader_error")
+        return {"grade_status": "useful"}
+    score = grade["score"]
     reason = grade.get("reason", "")
     
     if score == "yes":
         print(f"   [Grader] ✅ Approved. Reason: {reason}")
+        if state.get("search_context"):
+            posthoc.record("speculative_discarded")
+        _cache_answer(state)
         return {"grade_status": "useful"}
     else:
         print(f"   [Grader] ❌ Hallucination detected. Reason: {reason}")
-        print("   [Grader] 🔄 Falling back to Web Search...")
+        posthoc.record("grader_fallback")
+        if state.get("search_context"):
+            print("   [Grader] 🔮 Using speculative search results...")
+            posthoc.record("speculative_used")
+        else:
+            print("   [Grader] 🔄 Falling back to Web Search...")
         return {"grade_status": "not_useful"}
 
+async def node_posthoc_grade(state: AgentState):
+    """快速通道：答案已经返回，阅卷在后台跑；通过才写语义缓存，不通过交给 posthoc 的修正钩子"""
+    print("   [Grader] ⏩ Fast path -> grading in background")
+    posthoc.submit(
+        state.get("original_question") or state["question"],
+        state["generation"],
+        llm_service.grade_answer(_grader_input(state), Prompts.SYSTEM_GRADER),
+        on_approved=lambda: _cache_answer(state),
+    )
+    return {"grade_status": "deferred"}
+
 async def node_web_search(state: AgentState):
     print(f"   [Search] Searching Tavily for: {state['question']}...")
     res = await search_service.web_search_async(state["question"])
@@ -128,9 +302,9 @@ async def node_web_search(state: AgentState):
 
 async def node_generate_search(state: AgentState):
     user_p = Prompts.USER_SEARCH.format(context=state["search_context"], question=state["question"])
-    ans = await llm_service.generate(Prompts.SYSTEM_SEARCH, user_p)
+    ans = await _generate_streaming("search", Prompts.SYSTEM_SEARCH, user_p)
     return {"generation": ans}
 
 async def node_generate_chat(state: AgentState):
-    ans = await llm_service.generate(Prompts.SYSTEM_CHAT, state["question"], temp=0.5)
+    ans = await _generate_streaming("chat", Prompts.SYSTEM_CHAT, state["question"], temp=0.5)
     return {"generation": ans}
\ No newline at end of file
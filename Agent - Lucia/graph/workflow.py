@@ -1,29 +1,44 @@
 from langgraph.graph import StateGraph, END
 from schemas import AgentState
+from config import settings
 from graph.nodes import *
 
 def build_graph():
     workflow = StateGraph(AgentState)
     
     # 1. 注册节点
-    workflow.add_node("rewrite", node_rewrite)
-    workflow.add_node("router", node_router)
+    if settings.REWRITE_ROUTE_MODE == "sequential":
+        workflow.add_node("rewrite", node_rewrite)
+        workflow.add_node("router", node_router)
+    else:
+        workflow.add_node("router", node_rewrite_route)
+    workflow.add_node("cache", node_cache)
     workflow.add_node("retriever", node_retriever)
     workflow.add_node("gate", node_gate)
     workflow.add_node("rag_gen", node_generate_rag)
     workflow.add_node("grader", node_grader)
+    workflow.add_node("posthoc_grade", node_posthoc_grade)
     workflow.add_node("web_search", node_web_search)
     workflow.add_node("search_gen", node_generate_search)
     workflow.add_node("chat_gen", node_generate_chat)
 
     # 2. 设置连线
-    workflow.set_entry_point("rewrite")
-    workflow.add_edge("rewrite", "router")
+    if settings.REWRITE_ROUTE_MODE == "sequential":
+        workflow.set_entry_point("rewrite")
+        workflow.add_edge("rewrite", "router")
+    else:
+        workflow.set_entry_point("router")
     
     workflow.add_conditional_edges(
         "router",
         lambda x: x["route"],
-        {"rag": "retriever", "chat": "chat_gen"}
+        {"rag": "cache", "chat": "chat_gen"}
+    )
+    
+    workflow.add_conditional_edges(
+        "cache",
+        lambda x: "hit" if x["cache_hit"] else "miss",
+        {"hit": END, "miss": "retriever"}
     )
     
     workflow.add_edge("retriever", "gate")
@@ -34,12 +49,19 @@ def build_graph():
         {"good": "rag_gen", "bad": "web_search"}
     )
     
-    workflow.add_edge("rag_gen", "grader")
+    # 快速通道跳过同步阅卷，直接结束 (阅卷在后台跑)
+    workflow.add_conditional_edges(
+        "rag_gen",
+        lambda x: "fast" if x.get("fast_path") else "full",
+        {"fast": "posthoc_grade", "full": "grader"}
+    )
+    workflow.add_edge("posthoc_grade", END)
     
+    # 阅卷不通过时，投机搜索已经拿到结果就直接生成，不用再搜一遍
     workflow.add_conditional_edges(
         "grader",
-        lambda x: x["grade_status"],
-        {"useful": END, "not_useful": "web_search"}
+        lambda x: "speculative" if x["grade_status"] == "not_useful" and x.get("search_context") else x["grade_status"],
+        {"useful": END, "not_useful": "web_search", "speculative": "search_gen"}
     )
     
     workflow.add_edge("web_search", "search_gen")
@@ -2,9 +2,12 @@ import asyncio
 from graph.workflow import build_graph
 from config import settings
 from services.notification import notification_service # 👈
+from services.registry import registry
+from services.posthoc import posthoc
 
 async def main():
     app = build_graph()
+    await registry.warmup()
     
     print("\n" + "="*60)
     print("🚀 Mars IT Agent V4.0 (Async) | Rewrite -> RAG -> Grader -> Search")
@@ -18,11 +21,20 @@ async def main():
 
             print("   (Processing...)")
             
-            # 使用 await 异步调用
-            final_state = await app.ainvoke({"question": user_input})
+            # 流式调用：custom 通道收 token，values 通道拿最终 state
+            final_state = {}
+            current_source = None
+            async for mode, payload in app.astream({"question": user_input}, stream_mode=["custom", "values"]):
+                if mode == "values":
+                    final_state = payload
+                    continue
+                if payload["source"] != current_source:
+                    current_source = payload["source"]
+                    print("-" * 60)
+                    print(f"🤖 Agent ({current_source}): ", end="", flush=True)
+                print(payload["token"], end="", flush=True)
             
-            print("-" * 60)
-            print(f"🤖 Agent: {final_state['generation']}")
+            print()
             print("-" * 60)
             
             # --- 🔥 这里保留了你的详细分数展示区 ---
@@ -42,7 +54,9 @@ async def main():
             
             # 门控状态
             quality = "PASS" if final_state.get('retrieval_quality') else "FAIL -> Search"
-            print(f"   [DEBUG] Route: {route.upper()} | Gate Decision: {quality}")
+            cache = "HIT" if final_state.get('cache_hit') else "MISS"
+            grade = final_state.get('grade_status', 'N/A')
+            print(f"   [DEBUG] Route: {route.upper()} | Gate Decision: {quality} | Semantic Cache: {cache} | Grade: {grade}")
 
         except Exception as e:
             # 🔥 捕获未知的致命错误
@@ -54,5 +68,8 @@ async def main():
                 detail="主程序循环发生未捕获异常，请立即查看日志。"
             )
 
+    await posthoc.drain()
+    print(f"📊 [Paths] {posthoc.stats()}")
+
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
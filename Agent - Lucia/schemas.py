@@ -9,4 +9,7 @@ class AgentState(TypedDict):
     generation: str
     route: str
     retrieval_quality: bool
-    grade_status: str
\ No newline at end of file
+    grade_status: str       # useful / not_useful / deferred (快速通道，后台阅卷)
+    fast_path: bool
+    speculative: bool       # 风险区间：生成时并发做网络搜索
+    cache_hit: bool
@@ -0,0 +1,211 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+
+import uvicorn
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from graph.workflow import build_graph
+from config import settings
+from logger import logger
+from services.notification import notification_service
+from services.semantic_cache import semantic_cache
+from services.registry import registry
+from services.posthoc import posthoc
+from services.search import search_service
+from services.gateway import llm_gateway
+
+
+class ChatRequest(BaseModel):
+    question: str
+
+
+@asynccontextmanager
+async def lifespan(api: FastAPI):
+    # Graph 只编译一次，所有请求共享同一个 app (节点本身无状态)
+    api.state.graph = build_graph()
+    api.state.slots = asyncio.Semaphore(settings.MAX_INFLIGHT)
+    api.state.inflight = 0
+    # 服务在后台并发预热，端口先起来；/ready 在预热完成前返回 503
+    api.state.warmup = asyncio.create_task(registry.warmup())
+    posthoc.add_hook(_on_posthoc_reject)
+    logger.info("server_started", max_inflight=settings.MAX_INFLIGHT, timeout=settings.REQUEST_TIMEOUT)
+    yield
+    await posthoc.drain()
+    if registry.is_loaded("search"):
+        await search_service.aclose()
+    if registry.is_loaded("llm_gateway"):
+        await llm_gateway.aclose()
+
+
+async def _on_posthoc_reject(event: dict):
+    """快速通道的答案被后台阅卷打回：记录并报警，由人工跟进更正"""
+    logger.warning("posthoc_rejected", question=event["question"][:100], reason=event["reason"])
+    await notification_service.send_alert_async(
+        module_name="Posthoc Grader",
+        error_msg=f"Fast-path answer rejected: {event['reason']}",
+        detail=f"Question: {event['question'][:100]}\nAnswer: {event['answer'][:300]}",
+    )
+
+
+api = FastAPI(title="Mars IT Agent", lifespan=lifespan)
+
+
+def _require_ready():
+    """
+    预热完成前直接 503：否则请求会在事件循环里同步构造还没加载完的服务
+    (BM25 / 模型加载要几十秒)，把整个进程卡住，包括 /health 和 /ready 探针
+    """
+    if not registry.ready:
+        raise HTTPException(status_code=503, detail="Service warming up, please retry later.")
+
+
+async def _acquire_slot():
+    """排队拿名额；等太久直接 503，避免请求在进程里无限堆积"""
+    try:
+        await asyncio.wait_for(api.state.slots.acquire(), timeout=settings.QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="Server busy, please retry later.")
+    api.state.inflight += 1
+
+
+def _release_slot():
+    api.state.inflight -= 1
+    api.state.slots.release()
+
+
+def _summarize(final_state: dict) -> dict:
+    """把最终 state 转成可 JSON 序列化的响应 (去掉 dense_vec 等大字段)"""
+    docs = final_state.get("documents") or []
+    return {
+        "answer": final_state.get("generation", ""),
+        "route": final_state.get("route", "N/A"),
+        "retrieval_quality": final_state.get("retrieval_quality"),
+        "grade_status": final_state.get("grade_status"),
+        "cache_hit": bool(final_state.get("cache_hit")),
+        "documents": [
+            {"name": d.get("metadata", {}).get("name", "Unknown Doc"), "score": float(d.get("score", 0.0))}
+            for d in docs
+        ],
+    }
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _alert(question: str, e: Exception):
+    await notification_service.send_alert_async(
+        module_name="HTTP Server",
+        error_msg=str(e),
+        detail=f"Question: {question[:100]}",
+    )
+
+
+@api.get("/health")
+async def health():
+    return {
+        "status": "ok",
+        "inflight": api.state.inflight,
+        "max_inflight": settings.MAX_INFLIGHT,
+        "semantic_cache": semantic_cache.stats(),
+        "posthoc": posthoc.stats(),
+        "llm_gateway": llm_gateway.report() if registry.is_loaded("llm_gateway") else {},
+    }
+
+
+@api.get("/ready")
+async def ready():
+    report = registry.report()
+    if not report["ready"]:
+        raise HTTPException(status_code=503, detail=report)
+    return report
+
+
+@api.post("/chat")
+async def chat(req: ChatRequest):
+    question = req.question.strip()
+    if not question:
+        raise HTTPException(status_code=400, detail="Empty question.")
+    _require_ready()
+
+    await _acquire_slot()
+    try:
+        final_state = await asyncio.wait_for(
+            api.state.graph.ainvoke({"question": question}),
+            timeout=settings.REQUEST_TIMEOUT,
+        )
+        return _summarize(final_state)
+    except asyncio.TimeoutError:
+        logger.error("request_timeout", question=question[:100])
+        raise HTTPException(status_code=504, detail="Request timed out.")
+    except Exception as e:
+        logger.error("request_failed", error=str(e))
+        await _alert(question, e)
+        raise HTTPException(status_code=500, detail="Internal error.")
+    finally:
+        _release_slot()
+
+
+@api.post("/chat/stream")
+async def chat_stream(req: ChatRequest):
+    """
+    SSE 流式接口：
+    - token: 生成节点吐出的 token (source = rag / search / chat)
+    - node:  某个节点执行完毕 (grader 判定 not_useful 时，客户端应丢弃已收到的 rag token；
+             grade_status=deferred 表示走了快速通道，阅卷在后台进行)
+    - done:  最终结果
+    - error: 出错 / 超时 / 排队超时 (status=503)
+    预热未完成时在建流之前直接返回 HTTP 503
+    """
+    question = req.question.strip()
+    if not question:
+        raise HTTPException(status_code=400, detail="Empty question.")
+    _require_ready()
+
+    async def event_stream():
+        # 名额在生成器里面拿：客户端在 Starlette 开始迭代之前就断开时，生成器根本不会启动，
+        # 名额也就不会被拿走 (拿了却永远走不到 finally 会让名额永久泄漏)。
+        # 排队超时只能以 SSE error 事件返回 (响应头此时已经是 200)
+        try:
+            await _acquire_slot()
+        except HTTPException as e:
+            yield _sse("error", {"status": e.status_code, "detail": e.detail})
+            return
+
+        final_state = {}
+        try:
+            async with asyncio.timeout(settings.REQUEST_TIMEOUT):
+                async for mode, payload in api.state.graph.astream(
+                    {"question": question}, stream_mode=["custom", "updates", "values"]
+                ):
+                    if mode == "custom":
+                        yield _sse("token", payload)
+                        continue
+                    if mode == "values":
+                        final_state = payload
+                        continue
+                    for node_name, update in payload.items():
+                        update = update or {}
+                        yield _sse("node", {
+                            "node": node_name,
+                            **{k: update[k] for k in ("question", "route", "retrieval_quality", "grade_status") if k in update},
+                        })
+            yield _sse("done", _summarize(final_state))
+        except TimeoutError:
+            logger.error("request_timeout", question=question[:100])
+            yield _sse("error", {"detail": "Request timed out."})
+        except Exception as e:
+            logger.error("request_failed", error=str(e))
+            await _alert(question, e)
+            yield _sse("error", {"detail": "Internal error."})
+        finally:
+            _release_slot()
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+if __name__ == "__main__":
+    uvicorn.run(api, host=settings.SERVER_HOST, port=settings.SERVER_PORT)
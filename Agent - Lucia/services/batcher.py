@@ -0,0 +1,91 @@
+import asyncio
+from typing import Any, Callable, List, Optional
+from concurrent.futures import Executor
+
+class MicroBatcher:
+    """
+    微批处理：把一个短时间窗口内并发到达的请求攒成一批，
+    交给同步的批处理函数 batch_fn(items) -> results 在线程池里执行，再把结果按顺序分发回各个调用方。
+    - 攒够 max_batch 条立即发车，否则最多等 max_wait_ms
+    - 上一批还在跑时继续攒下一批，多批可以同时在 executor 里执行
+    """
+    def __init__(self, batch_fn: Callable[[List[Any]], List[Any]], max_batch: int, max_wait_ms: float,
+                 executor: Optional[Executor] = None):
+        self.batch_fn = batch_fn
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000.0
+        self.executor = executor
+
+        self._loop = None
+        self._queue = None
+        self._worker = None
+        self._inflight = set()
+
+        self.batches = 0
+        self.items = 0
+
+    def _ensure_worker(self):
+        # 单例在 import 时创建，那时还没有事件循环，所以队列和后台任务延迟到第一次调用时再建
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._collect())
+
+    async def submit(self, item: Any) -> Any:
+        return (await self.submit_many([item]))[0]
+
+    async def submit_many(self, items: List[Any]) -> List[Any]:
+        if not items:
+            return []
+        self._ensure_worker()
+        futures = []
+        for item in items:
+            fut = self._loop.create_future()
+            self._queue.put_nowait((item, fut))
+            futures.append(fut)
+        return list(await asyncio.gather(*futures))
+
+    async def _collect(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = self._loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            task = self._loop.create_task(self._flush(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _flush(self, batch):
+        # 调用方已经取消的就不用算了
+        batch = [(item, fut) for item, fut in batch if not fut.done()]
+        if not batch:
+            return
+        self.batches += 1
+        self.items += len(batch)
+
+        try:
+            results = await self._loop.run_in_executor(self.executor, self.batch_fn, [item for item, _ in batch])
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+
+        for (_, fut), result in zip(batch, results):
+            if not fut.done():
+                fut.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+        }
@@ -0,0 +1,147 @@
+"""
+BM25 稀疏编码器的紧凑二进制格式 + 向量化的 query 编码。
+
+pinecone_text 的 BM25Encoder 每次启动都要解析一个很大的 JSON，doc_freq 存成 Python dict。
+这里把词表 (mmh3 哈希后的 token id) 和文档频率存成两个连续数组：
+    [magic 8B][header_len uint32][header JSON][pad 到 8 字节][indices uint32 * n][doc_freq float32 * n]
+indices 升序排列，查询时用 searchsorted；文件用 mmap 只读打开，同机多个 worker 共享同一份物理内存。
+encode_queries() 的输出 (indices / values) 与 BM25Encoder 完全一致。
+
+转换: python -m services.bm25_fast bm25_model.json bm25_model.bin
+"""
+import os
+import sys
+import json
+import struct
+from collections import Counter
+from typing import Dict, List, Union
+import numpy as np
+
+MAGIC = b"BM25BIN\x01"
+
+_TOKENIZER_KEYS = ("lower_case", "remove_punctuation", "remove_stopwords", "stem", "language")
+_TOKENIZER_DEFAULTS = {
+    "lower_case": True,
+    "remove_punctuation": True,
+    "remove_stopwords": True,
+    "stem": True,
+    "language": "english",
+}
+
+
+def _params_from_json(json_path: str):
+    with open(json_path, "r", encoding="utf-8") as f:
+        params = json.load(f)
+    indices = np.asarray(params["doc_freq"]["indices"], dtype=np.uint32)
+    doc_freq = np.asarray(params["doc_freq"]["values"], dtype=np.float32)
+    order = np.argsort(indices, kind="stable")
+    header = {
+        "n_docs": int(params["n_docs"]),
+        "avgdl": float(params["avgdl"]),
+        "b": float(params.get("b", 0.75)),
+        "k1": float(params.get("k1", 1.2)),
+        **{k: params.get(k, _TOKENIZER_DEFAULTS[k]) for k in _TOKENIZER_KEYS},
+    }
+    return header, indices[order], doc_freq[order]
+
+
+def convert_json_to_binary(json_path: str, bin_path: str):
+    """把 BM25Encoder.dump() 出来的 JSON 转成二进制格式 (先写临时文件再原子替换)"""
+    header, indices, doc_freq = _params_from_json(json_path)
+    header["n_terms"] = int(indices.shape[0])
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    prefix_len = len(MAGIC) + 4 + len(header_bytes)
+    padding = b"\x00" * (-prefix_len % 8)
+
+    tmp = f"{bin_path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header_bytes)))
+        f.write(header_bytes)
+        f.write(padding)
+        f.write(indices.astype("<u4").tobytes())
+        f.write(doc_freq.astype("<f4").tobytes())
+    os.replace(tmp, bin_path)
+
+
+class FastBM25Encoder:
+    def __init__(self, header: dict, indices: np.ndarray, doc_freq: np.ndarray):
+        from pinecone_text.sparse.bm25_tokenizer import BM25Tokenizer
+
+        self.n_docs = header["n_docs"]
+        self.avgdl = header["avgdl"]
+        self.b = header["b"]
+        self.k1 = header["k1"]
+        self._indices = indices
+        self._doc_freq = doc_freq
+        self._tokenizer = BM25Tokenizer(**{k: header.get(k, _TOKENIZER_DEFAULTS[k]) for k in _TOKENIZER_KEYS})
+
+    @classmethod
+    def load_binary(cls, bin_path: str) -> "FastBM25Encoder":
+        with open(bin_path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{bin_path} is not a BM25 binary model")
+            (header_len,) = struct.unpack("<I", f.read(4))
+            header = json.loads(f.read(header_len).decode("utf-8"))
+
+        offset = len(MAGIC) + 4 + header_len
+        offset += -offset % 8
+        n = header["n_terms"]
+        # 只读 mmap：数据不拷贝进进程堆，多个进程共享操作系统的页缓存
+        indices = np.memmap(bin_path, dtype="<u4", mode="r", offset=offset, shape=(n,))
+        doc_freq = np.memmap(bin_path, dtype="<f4", mode="r", offset=offset + 4 * n, shape=(n,))
+        return cls(header, indices, doc_freq)
+
+    @classmethod
+    def load_json(cls, json_path: str) -> "FastBM25Encoder":
+        header, indices, doc_freq = _params_from_json(json_path)
+        return cls(header, indices, doc_freq)
+
+    @classmethod
+    def load(cls, json_path: str, bin_path: str = "", auto_convert: bool = True) -> "FastBM25Encoder":
+        """优先加载二进制；没有的话读 JSON，并顺手转换一份供下次启动使用"""
+        bin_path = bin_path or os.path.splitext(json_path)[0] + ".bin"
+        if os.path.exists(bin_path) and (
+            not os.path.exists(json_path) or os.path.getmtime(bin_path) >= os.path.getmtime(json_path)
+        ):
+            return cls.load_binary(bin_path)
+
+        encoder = cls.load_json(json_path)
+        if auto_convert:
+            try:
+                convert_json_to_binary(json_path, bin_path)
+                print(f"✅ [BM25] Converted {json_path} -> {bin_path}")
+            except OSError as e:
+                print(f"⚠️ [BM25] Could not write binary model: {e}")
+        return encoder
+
+    def _encode_single_query(self, text: str) -> Dict[str, List]:
+        import mmh3
+
+        counts = Counter(mmh3.hash(token, signed=False) for token in self._tokenizer(text))
+        token_ids = list(counts.keys())
+        if not token_ids:
+            return {"indices": [], "values": []}
+
+        ids = np.fromiter(token_ids, dtype=np.uint32, count=len(token_ids))
+        # 与 BM25Encoder 一致：没见过的词 df 按 1 算
+        df = np.ones(len(token_ids), dtype=np.float64)
+        if len(self._indices):
+            pos = np.minimum(np.searchsorted(self._indices, ids), len(self._indices) - 1)
+            found = self._indices[pos] == ids
+            df[found] = self._doc_freq[pos[found]]
+        idf = np.log((self.n_docs + 1) / (df + 0.5))
+        return {"indices": token_ids, "values": (idf / idf.sum()).tolist()}
+
+    def encode_queries(self, texts: Union[str, List[str]]):
+        if isinstance(texts, str):
+            return self._encode_single_query(texts)
+        return [self._encode_single_query(t) for t in texts]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python -m services.bm25_fast <bm25_model.json> <bm25_model.bin>")
+        sys.exit(1)
+    convert_json_to_binary(sys.argv[1], sys.argv[2])
+    print(f"✅ Wrote {sys.argv[2]}")
@@ -0,0 +1,49 @@
+"""
+Dense / Sparse 两路独立检索后的分数融合。
+
+- convex: alpha * dense + (1 - alpha) * sparse
+          dense 是余弦相似度 (裁剪到 0~1，本身就是绝对尺度)；
+          sparse 的 BM25 点积没有上界，按本次候选里的最高分归一化到 0~1。
+- rrf:    Reciprocal Rank Fusion，sum(1 / (k + rank))，只看名次不看分数；
+          再除以理论最大值 2 / (k + 1)，两路都排第一的文档得 1.0。
+
+融合后的分数都落在 0~1，node_gate / SCORE_FLOOR 这类门限可以直接用 (切换模式后建议重新标定)。
+sparse=None 表示这一路没有跑 (后端不支持纯稀疏检索)，只按剩下的 dense 一路打分，分数仍然落在 0~1；
+sparse=[] 则是跑了但没召回到东西。
+"""
+from typing import Dict, List, Optional
+
+
+def _merge_docs(*match_lists: List[Dict]) -> Dict[str, Dict]:
+    docs = {}
+    for matches in match_lists:
+        for m in matches:
+            docs.setdefault(m["id"], {"id": m["id"], "metadata": m.get("metadata") or {}})
+    return docs
+
+
+def convex_fuse(dense: List[Dict], sparse: Optional[List[Dict]], alpha: float, top_k: int) -> List[Dict]:
+    if sparse is None:
+        alpha, sparse = 1.0, []
+    docs = _merge_docs(dense, sparse)
+    dense_scores = {m["id"]: min(max(float(m["score"]), 0.0), 1.0) for m in dense}
+    sparse_max = max((float(m["score"]) for m in sparse), default=0.0)
+    sparse_scores = {m["id"]: float(m["score"]) / sparse_max for m in sparse} if sparse_max > 0 else {}
+
+    for doc_id, doc in docs.items():
+        doc["score"] = alpha * dense_scores.get(doc_id, 0.0) + (1 - alpha) * sparse_scores.get(doc_id, 0.0)
+    return sorted(docs.values(), key=lambda d: d["score"], reverse=True)[:top_k]
+
+
+def rrf_fuse(dense: List[Dict], sparse: Optional[List[Dict]], k: int, top_k: int) -> List[Dict]:
+    legs = [matches for matches in (dense, sparse) if matches is not None]
+    docs = _merge_docs(*legs)
+    scores = {doc_id: 0.0 for doc_id in docs}
+    for matches in legs:
+        for rank, m in enumerate(matches, start=1):
+            scores[m["id"]] += 1.0 / (k + rank)
+
+    max_score = len(legs) / (k + 1)
+    for doc_id, doc in docs.items():
+        doc["score"] = scores[doc_id] / max_score
+    return sorted(docs.values(), key=lambda d: d["score"], reverse=True)[:top_k]
@@ -1,19 +1,15 @@
 import json
-from openai import AsyncOpenAI
-from tenacity import retry, stop_after_attempt, wait_exponential
+from typing import AsyncIterator
 from config import settings
+from services.gateway import llm_gateway
+from services.registry import registry
 
 class LLMService:
-    def __init__(self):
-        self.client = AsyncOpenAI(
-            api_key=settings.ALI_KEY, 
-            base_url=settings.LLM_BASE_URL
-        )
+    """业务层的 LLM 调用；连接池、并发上限、重试、对冲都在 services/gateway.py 里统一处理"""
 
-    @retry(stop=stop_after_attempt(3))
     async def generate(self, system_prompt: str, user_prompt: str, temp: float = 0.2) -> str:
         try:
-            response = await self.client.chat.completions.create(
+            response = await llm_gateway.chat(
                 model=settings.LLM_MODEL,
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -26,10 +22,26 @@ class LLMService:
             print(f"❌ LLM Error: {e}")
             raise e
 
+    async def generate_stream(self, system_prompt: str, user_prompt: str, temp: float = 0.2) -> AsyncIterator[str]:
+        """流式生成：收到一段 token 就 yield 一段"""
+        async for chunk in llm_gateway.stream(
+            model=settings.LLM_MODEL,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            temperature=temp
+        ):
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+
     async def route_request(self, text: str, system_prompt: str) -> dict:
         """路由/分类专用"""
         try:
-            response = await self.client.chat.completions.create(
+            response = await llm_gateway.chat(
                 model=settings.ROUTER_MODEL,
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -39,13 +51,55 @@ class LLMService:
                 response_format={"type": "json_object"}
             )
             return json.loads(response.choices[0].message.content)
-        except:
+        except Exception as e:
+            # 网关已经重试过了，这里才兜底
+            print(f"❌ [LLM Route Error] {e}")
             return {"type": "rag", "score": "yes"} # 兜底
 
+    async def grade_answer(self, text: str, system_prompt: str) -> dict:
+        """
+        阅卷专用：不兜底。调用失败 / 返回里没有 yes|no 都直接抛异常，
+        调用方按 "没通过阅卷" 处理 (不写语义缓存)，而不是像 route_request 那样默认放行
+        """
+        response = await llm_gateway.chat(
+            model=settings.ROUTER_MODEL,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": text}
+            ],
+            temperature=0.0,
+            response_format={"type": "json_object"}
+        )
+        result = json.loads(response.choices[0].message.content)
+        if result.get("score") not in ("yes", "no"):
+            raise ValueError(f"Grader returned no yes/no score: {result}")
+        return result
+
+    async def rewrite_and_route(self, text: str, system_prompt: str) -> dict:
+        """重写 + 路由合并为一次 JSON 调用"""
+        try:
+            response = await llm_gateway.chat(
+                model=settings.ROUTER_MODEL,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": text}
+                ],
+                temperature=0.0,
+                response_format={"type": "json_object"}
+            )
+            result = json.loads(response.choices[0].message.content)
+            return {
+                "query": (result.get("query") or text).strip(),
+                "type": result.get("type", "rag")
+            }
+        except Exception as e:
+            print(f"❌ [LLM Rewrite/Route Error] {e}")
+            return {"query": text, "type": "rag"} # 兜底
+
     async def rewrite_query(self, text: str, system_prompt: str) -> str:
         """重写专用"""
         try:
-            response = await self.client.chat.completions.create(
+            response = await llm_gateway.chat(
                 model=settings.ROUTER_MODEL,
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -54,7 +108,8 @@ class LLMService:
                 temperature=0.0
             )
             return response.choices[0].message.content.strip()
-        except:
+        except Exception as e:
+            print(f"❌ [LLM Rewrite Error] {e}")
             return text
 
-llm_service = LLMService()
\ No newline at end of file
+llm_service = registry.lazy("llm", LLMService)
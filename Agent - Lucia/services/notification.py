@@ -3,6 +3,7 @@ import base64
 import asyncio
 from email.mime.text import MIMEText
 from config import settings
+from services.registry import registry
 from logger import logger
 
 # Google 官方库
@@ -80,4 +81,4 @@ Mars Agent 触发了自动降级保护 (Via Official Gmail API).
         """
         asyncio.create_task(asyncio.to_thread(self._send_sync, subject, body))
 
-notification_service = NotificationService()
\ No newline at end of file
+notification_service = registry.lazy("notification", NotificationService)
\ No newline at end of file
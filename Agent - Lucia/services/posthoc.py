@@ -0,0 +1,71 @@
+import asyncio
+import inspect
+from collections import Counter
+from typing import Awaitable, Callable, List, Optional
+
+class PosthocGrader:
+    """
+    快速通道的后台阅卷：答案先返回给用户，阅卷 (grader LLM 调用) 在后台跑。
+    - 通过：执行 on_approved (比如写语义缓存)
+    - 阅卷调用失败：不算通过，也不算幻觉，on_approved 不执行 (没阅过卷的答案不进缓存)
+    - 不通过：依次调用注册的修正钩子 (记录 / 报警 / 通知用户更正)
+    另外统计每种执行路径 (fast / full / search / cache ...) 走了多少次。
+    """
+    def __init__(self):
+        self._hooks: List[Callable[[dict], object]] = []
+        self._tasks = set()   # 持有后台任务的引用，防止被 GC 回收
+        self.paths = Counter()
+
+    def record(self, path: str):
+        self.paths[path] += 1
+
+    def add_hook(self, hook: Callable[[dict], object]):
+        """hook(event) 可以是普通函数也可以是协程函数；event 含 question / answer / reason"""
+        self._hooks.append(hook)
+
+    def submit(self, question: str, answer: str, grade: Awaitable[dict],
+               on_approved: Optional[Callable[[], object]] = None):
+        task = asyncio.create_task(self._run(question, answer, grade, on_approved))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, question, answer, grade, on_approved):
+        try:
+            result = await grade
+        except Exception as e:
+            # 阅卷本身挂了：答案已经发出去了，只记一笔；不当作幻觉处理，也不写缓存
+            self.record("posthoc_error")
+            print(f"⚠️ [Posthoc] Grader failed: {e}")
+            return
+
+        if result.get("score") == "yes":
+            self.record("posthoc_approved")
+            if on_approved is not None:
+                on_approved()
+            return
+
+        self.record("posthoc_rejected")
+        event = {"question": question, "answer": answer, "reason": result.get("reason", "")}
+        print(f"⚠️ [Posthoc] ❌ Fast-path answer rejected: {event['reason']}")
+        for hook in self._hooks:
+            try:
+                ret = hook(event)
+                if inspect.isawaitable(ret):
+                    await ret
+            except Exception as e:
+                print(f"⚠️ [Posthoc] Correction hook failed: {e}")
+
+    @property
+    def pending(self) -> int:
+        return len(self._tasks)
+
+    async def drain(self, timeout: float = 10.0):
+        """退出前等后台阅卷跑完，避免修正钩子被吞掉"""
+        if self._tasks:
+            await asyncio.wait(list(self._tasks), timeout=timeout)
+
+    def stats(self) -> dict:
+        return {"paths": dict(self.paths), "pending": self.pending}
+
+
+posthoc = PosthocGrader()
@@ -0,0 +1,90 @@
+import time
+import asyncio
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+class ServiceRegistry:
+    """
+    服务注册表：import 时只登记工厂函数，第一次真正用到 (或启动预热) 时才构造实例。
+    - get(): 线程安全的懒加载，同一个服务只会构造一次
+    - warmup(): 启动时在线程池里并发构造互不依赖的服务，记录每个服务的初始化耗时
+    - ready: 所有服务都构造成功后置为 True，供 /ready 探针使用
+    """
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self.timings: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+        self._ready = threading.Event()
+
+    def register(self, name: str, factory: Callable[[], Any]):
+        self._factories[name] = factory
+        self._locks[name] = threading.Lock()
+
+    def lazy(self, name: str, factory: Callable[[], Any]) -> "LazyService":
+        """登记并返回一个代理对象，原来 `from services.xxx import xxx_service` 的写法不用改"""
+        self.register(name, factory)
+        return LazyService(self, name)
+
+    def get(self, name: str) -> Any:
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._locks[name]:
+            if name not in self._instances:
+                start = time.perf_counter()
+                self._instances[name] = self._factories[name]()
+                self.timings[name] = time.perf_counter() - start
+                print(f"   [Registry] {name} ready in {self.timings[name]:.2f}s")
+        return self._instances[name]
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._instances
+
+    async def warmup(self, names: Optional[List[str]] = None):
+        """并发初始化所有 (或指定) 服务；失败的记到 errors 里，不影响其他服务"""
+        names = names or list(self._factories)
+
+        async def _init(name):
+            try:
+                await asyncio.to_thread(self.get, name)
+            except Exception as e:
+                self.errors[name] = str(e)
+                print(f"❌ [Registry] {name} failed to initialize: {e}")
+
+        start = time.perf_counter()
+        await asyncio.gather(*(_init(n) for n in names))
+        print(f"✅ [Registry] Warm-up finished in {time.perf_counter() - start:.2f}s")
+
+        if all(self.is_loaded(n) for n in self._factories):
+            self._ready.set()
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def report(self) -> dict:
+        return {
+            "ready": self.ready,
+            "loaded": sorted(self._instances),
+            "pending": sorted(set(self._factories) - set(self._instances)),
+            "timings": {k: round(v, 3) for k, v in self.timings.items()},
+            "errors": dict(self.errors),
+        }
+
+
+class LazyService:
+    """服务的懒加载代理：第一次访问属性时才去注册表里取 (构造) 真正的实例"""
+    def __init__(self, registry: ServiceRegistry, name: str):
+        object.__setattr__(self, "_registry", registry)
+        object.__setattr__(self, "_name", name)
+
+    def __getattr__(self, attr):
+        return getattr(self._registry.get(self._name), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._registry.get(self._name), attr, value)
+
+
+registry = ServiceRegistry()
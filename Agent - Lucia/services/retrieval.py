@@ -0,0 +1,185 @@
+"""
+检索后端：VectorService 只依赖 query(dense_vec, sparse_vec, top_k) 和 fetch_metadata(ids) 两个接口，
+query 返回 [{"id", "score", "metadata"}]，与 Pinecone matches 的结构一致。
+
+- PineconeBackend: 远程 Pinecone 索引 (默认)
+                   只做稀疏检索 (dense_vec=None) 需要单独的 sparse 索引 (PINECONE_SPARSE_INDEX)：
+                   主索引是 dotproduct 混合索引 (原生混合检索一次查询同时打 dense + sparse 分)，
+                   它没有只查 sparse 的接口，拿全零 dense 向量凑数并不可靠，所以不这么做；
+                   没配 sparse 索引时 supports_sparse_only=False，融合检索直接跳过 sparse 这一路
+- LocalBackend:    进程内索引，dense 矩阵 + BM25 倒排表，从 Pinecone 导出的快照 mmap 加载
+                   知识库只有几千条 name/steps 文档，本地算一次比走一趟网络快得多，也能离线跑
+
+快照目录结构 (export_snapshot.py 生成)：
+    manifest.json       索引名 / 条数 / 维度 / 导出时间
+    ids.json            文档 id 列表 (行号 = 内部 doc 下标)
+    metadata.jsonl      每行一个文档的 metadata
+    dense.npy           float32 (N, D)
+    sparse_terms.npy    uint32 (T,)   升序排列的 token id
+    sparse_indptr.npy   int64  (T+1,) 每个 token 的倒排表在 docs/vals 里的区间
+    sparse_docs.npy     int32         倒排表：doc 下标
+    sparse_vals.npy     float32       倒排表：该 token 在该文档里的权重
+"""
+import os
+import json
+import time
+from typing import Dict, List, Optional
+import numpy as np
+
+
+class PineconeBackend:
+    def __init__(self, index, timeout: float, sparse_index=None):
+        self.index = index
+        self.sparse_index = sparse_index
+        self.timeout = timeout
+        self.version = ""
+
+    @property
+    def supports_sparse_only(self) -> bool:
+        return self.sparse_index is not None
+
+    def query(self, dense_vec: Optional[List[float]], sparse_vec: Optional[Dict], top_k: int,
+              include_metadata: bool = True) -> List[Dict]:
+        if dense_vec is None:
+            if self.sparse_index is None:
+                raise ValueError("Sparse-only query needs PINECONE_SPARSE_INDEX (the dense index rejects all-zero vectors)")
+            if not sparse_vec or not sparse_vec["indices"]:
+                return []
+            res = self.sparse_index.query(sparse_vector=sparse_vec, top_k=top_k, include_metadata=include_metadata,
+                                          _request_timeout=self.timeout)
+            return self._matches(res)
+
+        # embedding 缓存里是 float32 ndarray，Pinecone SDK 要普通 list
+        query_kwargs = dict(vector=np.asarray(dense_vec, dtype=np.float32).tolist(), top_k=top_k,
+                            include_metadata=include_metadata, _request_timeout=self.timeout)
+        if sparse_vec and sparse_vec["indices"]:
+            query_kwargs["sparse_vector"] = sparse_vec
+        return self._matches(self.index.query(**query_kwargs))
+
+    @staticmethod
+    def _matches(res) -> List[Dict]:
+        # 转成普通 dict，state 里不放 SDK 对象 (方便序列化 / 缓存)
+        return [
+            {"id": m["id"], "score": float(m["score"]), "metadata": dict(m.get("metadata") or {})}
+            for m in res.get("matches", [])
+        ]
+
+    def fetch_metadata(self, ids: List[str]) -> Dict[str, Dict]:
+        """按 id 补拉 metadata (先 include_metadata=False 粗召回，只给留下来的候选拉正文)"""
+        if not ids:
+            return {}
+        res = self.index.fetch(ids=list(ids), _request_timeout=self.timeout)
+        return {vid: dict(vec.metadata or {}) for vid, vec in res.vectors.items()}
+
+
+class LocalBackend:
+    supports_sparse_only = True
+
+    def __init__(self, snapshot_dir: str):
+        with open(os.path.join(snapshot_dir, "manifest.json"), "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        with open(os.path.join(snapshot_dir, "ids.json"), "r", encoding="utf-8") as f:
+            self.ids = json.load(f)
+        with open(os.path.join(snapshot_dir, "metadata.jsonl"), "r", encoding="utf-8") as f:
+            self.metadata = [json.loads(line) for line in f]
+
+        def _load(name):
+            return np.load(os.path.join(snapshot_dir, name), mmap_mode="r")
+
+        self.dense = _load("dense.npy")
+        self.sparse_terms = _load("sparse_terms.npy")
+        self.sparse_indptr = _load("sparse_indptr.npy")
+        self.sparse_docs = _load("sparse_docs.npy")
+        self.sparse_vals = _load("sparse_vals.npy")
+        self.version = str(self.manifest.get("exported_at", ""))
+        self._rows = {vid: i for i, vid in enumerate(self.ids)}
+        print(f"✅ [LocalIndex] {len(self.ids)} docs loaded from {snapshot_dir}")
+
+    def _sparse_scores(self, sparse_vec: Dict) -> np.ndarray:
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        if not sparse_vec or not sparse_vec["indices"] or not len(self.sparse_terms):
+            return scores
+        terms = np.asarray(sparse_vec["indices"], dtype=np.uint32)
+        weights = np.asarray(sparse_vec["values"], dtype=np.float32)
+        pos = np.minimum(np.searchsorted(self.sparse_terms, terms), len(self.sparse_terms) - 1)
+        for p, term, w in zip(pos, terms, weights):
+            if self.sparse_terms[p] != term:
+                continue
+            lo, hi = self.sparse_indptr[p], self.sparse_indptr[p + 1]
+            np.add.at(scores, self.sparse_docs[lo:hi], self.sparse_vals[lo:hi] * w)
+        return scores
+
+    def query(self, dense_vec: Optional[List[float]], sparse_vec: Optional[Dict], top_k: int,
+              include_metadata: bool = True) -> List[Dict]:
+        # 与 Pinecone 的 dotproduct 混合检索一致：score = dense·q + sparse·q_sparse
+        scores = self._sparse_scores(sparse_vec)
+        if dense_vec is not None:
+            scores += self.dense @ np.asarray(dense_vec, dtype=np.float32)
+
+        top_k = min(top_k, len(scores))
+        if top_k <= 0:
+            return []
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            {"id": self.ids[i], "score": float(scores[i]),
+             "metadata": dict(self.metadata[i]) if include_metadata else {}}
+            for i in top
+        ]
+
+    def fetch_metadata(self, ids: List[str]) -> Dict[str, Dict]:
+        return {vid: dict(self.metadata[self._rows[vid]]) for vid in ids if vid in self._rows}
+
+
+def export_pinecone_snapshot(index, out_dir: str, index_name: str, namespace: str = "", batch_size: int = 100):
+    """把 Pinecone 索引完整导出为 LocalBackend 的快照 (需要 serverless 索引的 list 接口)"""
+    os.makedirs(out_dir, exist_ok=True)
+    ids, dense, metadata = [], [], []
+    postings: Dict[int, List] = {}
+
+    for id_batch in index.list(namespace=namespace):
+        for start in range(0, len(id_batch), batch_size):
+            chunk = id_batch[start:start + batch_size]
+            fetched = index.fetch(ids=chunk, namespace=namespace).vectors
+            for vid in chunk:
+                vec = fetched.get(vid)
+                if vec is None:
+                    continue
+                doc = len(ids)
+                ids.append(vid)
+                dense.append(vec.values)
+                metadata.append(dict(vec.metadata or {}))
+                sparse = getattr(vec, "sparse_values", None)
+                if sparse:
+                    for term, val in zip(sparse.indices, sparse.values):
+                        postings.setdefault(int(term), []).append((doc, float(val)))
+        print(f"   exported {len(ids)} vectors...")
+
+    terms = np.array(sorted(postings), dtype=np.uint32)
+    indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+    docs, vals = [], []
+    for i, term in enumerate(terms):
+        plist = postings[int(term)]
+        docs.extend(d for d, _ in plist)
+        vals.extend(v for _, v in plist)
+        indptr[i + 1] = len(docs)
+
+    np.save(os.path.join(out_dir, "dense.npy"), np.asarray(dense, dtype=np.float32))
+    np.save(os.path.join(out_dir, "sparse_terms.npy"), terms)
+    np.save(os.path.join(out_dir, "sparse_indptr.npy"), indptr)
+    np.save(os.path.join(out_dir, "sparse_docs.npy"), np.asarray(docs, dtype=np.int32))
+    np.save(os.path.join(out_dir, "sparse_vals.npy"), np.asarray(vals, dtype=np.float32))
+    with open(os.path.join(out_dir, "ids.json"), "w", encoding="utf-8") as f:
+        json.dump(ids, f, ensure_ascii=False)
+    with open(os.path.join(out_dir, "metadata.jsonl"), "w", encoding="utf-8") as f:
+        for meta in metadata:
+            f.write(json.dumps(meta, ensure_ascii=False) + "\n")
+    with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "index_name": index_name,
+            "namespace": namespace,
+            "count": len(ids),
+            "dim": len(dense[0]) if dense else 0,
+            "exported_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }, f, ensure_ascii=False, indent=2)
+    return len(ids)
@@ -1,24 +1,80 @@
 import asyncio
-from tavily import TavilyClient
 from config import settings
+from services.cache import LRUCache, normalize_text
+from services.registry import registry
 
 class SearchService:
+    """
+    Tavily 原生异步客户端 (直接调 REST 接口，不再把同步 SDK 丢进线程池)：
+    - httpx.AsyncClient 长连接池，连续搜索复用同一条 TLS 连接
+    - Semaphore 限制同时在飞的搜索数，超出的排队
+    - 连接 / 读取超时
+    - 规范化 query 做 key 的 TTL 缓存；同一个 query 并发到达时只发一次请求
+    """
     def __init__(self):
-        self.client = TavilyClient(api_key=settings.TAVILY_KEY)
+        import httpx
+
+        self.client = httpx.AsyncClient(
+            base_url=settings.TAVILY_BASE_URL,
+            headers={"Authorization": f"Bearer {settings.TAVILY_KEY}"},
+            timeout=httpx.Timeout(settings.SEARCH_TIMEOUT, connect=settings.SEARCH_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=settings.SEARCH_CONCURRENCY,
+                max_keepalive_connections=settings.SEARCH_CONCURRENCY,
+            ),
+        )
+        self._slots = asyncio.Semaphore(settings.SEARCH_CONCURRENCY)
+        self.cache = LRUCache(settings.SEARCH_CACHE_SIZE, ttl=settings.SEARCH_CACHE_TTL)
+        self._inflight = {}
+
+    @staticmethod
+    def _format(results) -> str:
+        formatted = []
+        for r in results:
+            formatted.append(f"来源: {r.get('title')}\n链接: {r.get('url')}\n摘要: {r.get('content')}")
+        return "\n\n".join(formatted)
+
+    async def _fetch(self, key: str, query: str) -> str:
+        async with self._slots:
+            resp = await self.client.post("/search", json={
+                "query": query,
+                "search_depth": "basic",
+                "max_results": settings.SEARCH_MAX_RESULTS,
+            })
+        resp.raise_for_status()
+        result = self._format(resp.json().get("results", []))
+        # 在请求任务里写缓存：调用方中途放弃 (投机搜索超时) 时结果也不浪费
+        self.cache.put(key, result)
+        return result
+
+    def _finish(self, key: str, task: asyncio.Future):
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # 所有调用方都被取消时，避免 "exception was never retrieved"
+
+    async def search(self, query: str) -> str:
+        """失败直接抛异常 (不缓存)，由调用方决定怎么降级"""
+        key = normalize_text(query).lower()
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(key, query))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        # shield：某个调用方被取消 (比如投机搜索被丢弃) 不影响其他在等同一个结果的请求
+        return await asyncio.shield(task)
 
     async def web_search_async(self, query: str):
-        def _search():
-            try:
-                res = self.client.search(query, search_depth="basic", max_results=3)
-                results = res.get("results", [])
-                formatted = []
-                for r in results:
-                    formatted.append(f"来源: {r.get('title')}\n链接: {r.get('url')}\n摘要: {r.get('content')}")
-                return "\n\n".join(formatted)
-            except Exception as e:
-                print(f"Search API Error: {e}")
-                return "网络搜索失败。"
-        
-        return await asyncio.to_thread(_search)
-
-search_service = SearchService()
\ No newline at end of file
+        try:
+            return await self.search(query)
+        except Exception as e:
+            print(f"Search API Error: {e}")
+            return "网络搜索失败。"
+
+    async def aclose(self):
+        await self.client.aclose()
+
+search_service = registry.lazy("search", SearchService)
@@ -1,30 +1,87 @@
+import os
 import asyncio
-import jieba
-import google.genai as genai
-from pinecone import Pinecone
-from pinecone_text.sparse import BM25Encoder
+from typing import Dict, List
+import numpy as np
 from config import settings
 from services.notification import notification_service
+from services.cache import EmbeddingCache, normalize_text
+from services.batcher import MicroBatcher
+from services.bm25_fast import FastBM25Encoder
+from services.tokenizer import tokenizer
+from services.retrieval import PineconeBackend, LocalBackend
+from services.fusion import convex_fuse, rrf_fuse
+from services.registry import registry
 
 class VectorService:
     def __init__(self):
+        # SDK 在这里才 import，import 本模块本身不再有任何开销
+        import google.genai as genai
+
         self.google_client = genai.Client(api_key=settings.GEMINI_KEY)
-        self.pc = Pinecone(api_key=settings.PINECONE_KEY)
-        self.index = self.pc.Index(settings.INDEX_NAME)
-        # 加载 BM25 可能比较慢，实际生产中建议预加载
-        self.bm25 = BM25Encoder().load(settings.BM25_PATH)
+        self.backend = self._build_backend()
+        if settings.FUSION_MODE != "native" and not self.backend.supports_sparse_only:
+            # 融合检索要单独的 sparse 一路；没有就只剩 dense，关键词类 query 的召回会明显变差
+            print(f"⚠️ [Vector] FUSION_MODE={settings.FUSION_MODE} but no sparse index "
+                  f"(PINECONE_SPARSE_INDEX unset) -> 融合检索降级为只走 dense")
+        # 二进制 BM25 模型 (mmap，多进程共享)；第一次启动会从 JSON 自动转换
+        self.bm25 = FastBM25Encoder.load(settings.BM25_PATH, settings.BM25_BIN_PATH)
+        self.embed_cache = EmbeddingCache(settings.EMBED_MODEL, settings.EMBED_CACHE_SIZE, settings.EMBED_CACHE_PATH)
+        # 并发到达的单条 embedding 请求在这里攒成一次 embed_content 调用
+        self.embed_batcher = MicroBatcher(self.embed_queries, settings.EMBED_BATCH_MAX, settings.EMBED_BATCH_WAIT_MS)
+
+    def _build_backend(self):
+        """RETRIEVAL_BACKEND=local 时用进程内索引，否则走 Pinecone"""
+        if settings.RETRIEVAL_BACKEND == "local":
+            return LocalBackend(settings.LOCAL_INDEX_DIR)
+
+        from pinecone import Pinecone
+        # 整个进程复用同一个 Index 连接池，pool_threads 决定底层 HTTP 连接数
+        self.pc = Pinecone(api_key=settings.PINECONE_KEY, pool_threads=settings.PINECONE_POOL_THREADS)
+        index = self.pc.Index(settings.INDEX_NAME, pool_threads=settings.PINECONE_POOL_THREADS)
+        sparse_index = None
+        if settings.PINECONE_SPARSE_INDEX:
+            sparse_index = self.pc.Index(settings.PINECONE_SPARSE_INDEX, pool_threads=settings.PINECONE_POOL_THREADS)
+        return PineconeBackend(index, timeout=settings.PINECONE_TIMEOUT, sparse_index=sparse_index)
+
+    def kb_fingerprint(self) -> str:
+        """知识库指纹：索引名 / embedding 模型 / BM25 文件 / KB_VERSION 任一变化，语义缓存即失效"""
+        try:
+            st = os.stat(settings.BM25_PATH)
+            bm25_sig = f"{st.st_mtime_ns}:{st.st_size}"
+        except OSError:
+            bm25_sig = "missing"
+        return f"{settings.INDEX_NAME}|{settings.EMBED_MODEL}|{bm25_sig}|{settings.KB_VERSION}|{self.backend.version}"
+
+    def embed_queries(self, texts: List[str]) -> List[np.ndarray]:
+        """
+        批量 embedding (同步)：先查缓存，剩下的去重后按 EMBED_BATCH_MAX 分块调用 embed_content。
+        预热缓存 (warmup_embeddings.py) 直接用这个。
+        """
+        results = [self.embed_cache.get(t) for t in texts]
+        missing = list(dict.fromkeys(normalize_text(t) for t, r in zip(texts, results) if r is None))
+
+        fresh = {}
+        for i in range(0, len(missing), settings.EMBED_BATCH_MAX):
+            chunk = missing[i:i + settings.EMBED_BATCH_MAX]
+            res = self.google_client.models.embed_content(
+                model=settings.EMBED_MODEL,
+                contents=chunk,
+                config={"task_type": "RETRIEVAL_QUERY"},
+            )
+            for t, emb in zip(chunk, res.embeddings):
+                fresh[t] = self.embed_cache.put(t, emb.values)
+
+        return [r if r is not None else fresh[normalize_text(t)] for t, r in zip(texts, results)]
 
     def _embed_sync(self, text: str):
-        res = self.google_client.models.embed_content(
-            model=settings.EMBED_MODEL,
-            contents=text.strip(),
-            config={"task_type": "RETRIEVAL_QUERY"},
-        )
-        return res.embeddings[0].values
+        return self.embed_queries([text])[0]
+
+    async def embed_queries_async(self, texts: List[str]) -> List[np.ndarray]:
+        return await self.embed_batcher.submit_many(texts)
 
     async def embed_query_async(self, text: str):
         try:
-            return await asyncio.to_thread(self._embed_sync, text)
+            return await self.embed_batcher.submit(text)
         except Exception as e:
             print(f"⚠️ [Embedding Fail] Gemini Error: {e} -> 降级处理")
             
@@ -38,13 +95,61 @@ class VectorService:
             
             return None
 
+    def _encode_sparse(self, text: str) -> Dict:
+        sparse_output = self.bm25.encode_queries([tokenizer.tokenize(text)])
+        return sparse_output[0] if isinstance(sparse_output, list) else sparse_output
+
+    def _hybrid_search_sync(self, text: str, dense_vec: List[float], top_k: int = 3) -> List[Dict]:
+        sparse_vec = self._encode_sparse(text)
+
+        # dotproduct 索引下，分别缩放 dense / sparse 就是调整两路在最终分数里的权重
+        # 默认都是 1.0，分数与不加权时一致 (SCORE_FLOOR 等门限不用重新标定)
+        if settings.HYBRID_DENSE_WEIGHT != 1.0:
+            dense_vec = [v * settings.HYBRID_DENSE_WEIGHT for v in dense_vec]
+        if settings.HYBRID_SPARSE_WEIGHT != 1.0:
+            sparse_vec = {
+                "indices": sparse_vec["indices"],
+                "values": [v * settings.HYBRID_SPARSE_WEIGHT for v in sparse_vec["values"]],
+            }
+
+        return self.backend.query(dense_vec, sparse_vec, top_k)
+
+    def _sparse_search_sync(self, text: str, top_k: int) -> List[Dict]:
+        sparse_vec = self._encode_sparse(text)
+        if not sparse_vec["indices"]:
+            return []
+        return self.backend.query(None, sparse_vec, top_k)
+
+    async def _fused_search(self, text: str, dense_vec: List[float], top_k: int) -> List[Dict]:
+        """
+        dense / sparse 两路并发独立检索，再按 FUSION_MODE 融合打分。
+        后端做不了纯稀疏检索 (Pinecone 没配 sparse 索引) 时跳过 sparse 这一路，只用 dense 一路融合
+        """
+        depth = max(top_k, settings.FUSION_CANDIDATES)
+        if self.backend.supports_sparse_only:
+            dense_matches, sparse_matches = await asyncio.gather(
+                asyncio.to_thread(self.backend.query, dense_vec, None, depth),
+                asyncio.to_thread(self._sparse_search_sync, text, depth),
+            )
+        else:
+            dense_matches = await asyncio.to_thread(self.backend.query, dense_vec, None, depth)
+            sparse_matches = None
+        if settings.FUSION_MODE == "rrf":
+            return rrf_fuse(dense_matches, sparse_matches, settings.RRF_K, top_k)
+        return convex_fuse(dense_matches, sparse_matches, settings.FUSION_ALPHA, top_k)
+
     async def hybrid_search_async(self, text, dense_vec, top_k=3):
         if dense_vec is None:
             # 这里其实是上一步导致的，可以不报警，或者报一个 Info 级别
             return [] 
 
         try:
-            return await asyncio.to_thread(self._hybrid_search_sync, text, dense_vec, top_k)
+            # 线程里有 _request_timeout，这里再兜一层总超时 (含排队等线程的时间)
+            if settings.FUSION_MODE == "native":
+                search = asyncio.to_thread(self._hybrid_search_sync, text, dense_vec, top_k)
+            else:
+                search = self._fused_search(text, dense_vec, top_k)
+            return await asyncio.wait_for(search, timeout=settings.PINECONE_TIMEOUT + 1.0)
         except Exception as e:
             print(f"⚠️ [Pinecone Fail] Search Error: {e} -> 降级为 Web Search")
             
@@ -57,4 +162,4 @@ class VectorService:
             
             return []
 
-vec_service = VectorService()
\ No newline at end of file
+vec_service = registry.lazy("vector", VectorService)
\ No newline at end of file
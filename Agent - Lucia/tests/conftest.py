@@ -0,0 +1,9 @@
+import os
+import sys
+
+# 模块都是按 Agent 根目录的顶层包 import 的 (config / services / graph ...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# config.Settings 要求这几个密钥存在；测试不访问真实服务，给占位值即可
+for _key in ("ALI_KEY", "PINECONE_KEY", "GEMINI_KEY", "TAVILY_KEY"):
+    os.environ.setdefault(_key, "test")
@@ -0,0 +1,104 @@
+"""
+SearchService：TTL 缓存命中 / 并发相同 query 只打一次上游 / 超时降级。
+上游 Tavily 用 httpx.MockTransport 替身，记录收到的请求数。
+"""
+import asyncio
+
+import httpx
+import pytest
+
+from config import settings
+from services.search import SearchService
+
+
+class _StandIn:
+    def __init__(self, latency: float = 0.0, error: Exception = None):
+        self.latency = latency
+        self.error = error
+        self.requests = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        if self.error is not None:
+            raise self.error
+        return httpx.Response(200, json={"results": [
+            {"title": "VPN 排障", "url": "https://example.com/vpn", "content": "重启 GlobalProtect"},
+        ]})
+
+
+def _service(monkeypatch, upstream: _StandIn, ttl: float = 600.0) -> SearchService:
+    monkeypatch.setattr(settings, "SEARCH_CACHE_TTL", ttl)
+    service = SearchService()
+    service.client = httpx.AsyncClient(base_url="https://tavily.test", transport=httpx.MockTransport(upstream))
+    return service
+
+
+def test_ttl_cache_hits_and_expires(monkeypatch):
+    upstream = _StandIn()
+    service = _service(monkeypatch, upstream, ttl=0.2)
+
+    async def _run():
+        first = await service.search("VPN 连不上")
+        # 规范化后相同的 query 共用缓存
+        second = await service.search("  vpn   连不上 ")
+        assert first == second
+        assert upstream.requests == 1
+        assert service.cache.hits == 1
+
+        await asyncio.sleep(0.25)
+        await service.search("VPN 连不上")
+        assert upstream.requests == 2
+        await service.aclose()
+
+    asyncio.run(_run())
+
+
+def test_concurrent_identical_queries_share_one_request(monkeypatch):
+    upstream = _StandIn(latency=0.1)
+    service = _service(monkeypatch, upstream)
+
+    async def _run():
+        results = await asyncio.gather(*(service.search("打印机脱机") for _ in range(20)))
+        assert len(set(results)) == 1
+        assert upstream.requests == 1
+        assert not service._inflight
+        await service.aclose()
+
+    asyncio.run(_run())
+
+
+def test_cancelled_caller_does_not_cancel_shared_request(monkeypatch):
+    upstream = _StandIn(latency=0.1)
+    service = _service(monkeypatch, upstream)
+
+    async def _run():
+        dropped = asyncio.create_task(service.search("Outlook 打不开"))
+        kept = asyncio.create_task(service.search("Outlook 打不开"))
+        await asyncio.sleep(0.01)
+        dropped.cancel()
+        assert "example.com" in await kept
+        assert upstream.requests == 1
+        await service.aclose()
+
+    asyncio.run(_run())
+
+
+def test_timeout_falls_back_and_is_not_cached(monkeypatch):
+    upstream = _StandIn(error=httpx.ReadTimeout("read timed out"))
+    service = _service(monkeypatch, upstream)
+
+    async def _run():
+        with pytest.raises(httpx.ReadTimeout):
+            await service.search("蓝屏")
+        assert await service.web_search_async("蓝屏") == "网络搜索失败。"
+        assert len(service.cache) == 0
+        assert not service._inflight
+
+        # 上游恢复后，失败没有被缓存，会重新请求
+        upstream.error = None
+        assert "example.com" in await service.web_search_async("蓝屏")
+        assert upstream.requests == 3
+        await service.aclose()
+
+    asyncio.run(_run())
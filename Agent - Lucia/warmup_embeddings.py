@@ -0,0 +1,36 @@
+"""
+用历史 query 日志预热 embedding 缓存。
+用法: python warmup_embeddings.py queries.txt [--chunk 256]
+日志每行一个 query，重复的会先去重；已在缓存里的不会再调 API。
+"""
+import sys
+import time
+import argparse
+from services.cache import normalize_text
+from services.vector import vec_service
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-warm the embedding cache from a query log.")
+    parser.add_argument("log_path")
+    parser.add_argument("--chunk", type=int, default=256, help="每批交给 embed_queries 的条数")
+    args = parser.parse_args()
+
+    with open(args.log_path, "r", encoding="utf-8") as f:
+        queries = list(dict.fromkeys(normalize_text(line) for line in f if line.strip()))
+
+    print(f"📄 {len(queries)} unique queries loaded from {args.log_path}")
+    start = time.perf_counter()
+    for i in range(0, len(queries), args.chunk):
+        chunk = queries[i:i + args.chunk]
+        try:
+            vec_service.embed_queries(chunk)
+        except Exception as e:
+            print(f"❌ Chunk {i // args.chunk} failed: {e}")
+            continue
+        done = min(i + args.chunk, len(queries))
+        print(f"   {done}/{len(queries)} ({time.perf_counter() - start:.1f}s)")
+
+    print(f"✅ Done in {time.perf_counter() - start:.1f}s | cache: {vec_service.embed_cache.stats()}")
+
+if __name__ == "__main__":
+    sys.exit(main())
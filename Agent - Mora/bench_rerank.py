@@ -0,0 +1,98 @@
+"""
+Rerank 后端对比：精度 (对齐 fp32 torch 的分数) + 吞吐 (pairs/s)。
+用法: python bench_rerank.py --backends int8 onnx [--repeat 5] [--threads 4]
+"""
+import time
+import argparse
+import numpy as np
+import torch
+from config.settings import Config
+from services.rerank_backends import load_backend
+
+MODEL_NAME = "BAAI/bge-reranker-base"
+
+# 固定的小型评测集：每个 query 配一篇相关文档 (排第一) 和若干干扰文档
+FIXTURES = [
+    ("VPN连接失败", [
+        "场景标题：VPN 无法连接\n详细步骤：1. 检查网络 2. 重启 GlobalProtect 客户端 3. 重新输入域账号密码",
+        "场景标题：打印机脱机\n详细步骤：1. 检查打印机电源 2. 重新添加网络打印机",
+        "场景标题：Outlook 无法收信\n详细步骤：1. 检查邮箱容量 2. 重建 OST 文件",
+    ]),
+    ("域账号密码重置", [
+        "场景标题：忘记域账号密码\n详细步骤：1. 访问自助密码重置门户 2. 通过手机验证码验证身份 3. 设置新密码",
+        "场景标题：Teams 会议无声音\n详细步骤：1. 检查扬声器设备 2. 在 Teams 设置里切换音频设备",
+        "场景标题：VPN 无法连接\n详细步骤：1. 检查网络 2. 重启 GlobalProtect 客户端",
+    ]),
+    ("打印机无法打印", [
+        "场景标题：打印机脱机\n详细步骤：1. 检查打印机电源 2. 重新添加网络打印机 3. 清空打印队列",
+        "场景标题：忘记域账号密码\n详细步骤：1. 访问自助密码重置门户",
+        "场景标题：电脑蓝屏\n详细步骤：1. 记录蓝屏代码 2. 联系 IT 服务台",
+    ]),
+    ("Outlook 收不到邮件", [
+        "场景标题：Outlook 无法收信\n详细步骤：1. 检查邮箱容量 2. 重建 OST 文件 3. 检查垃圾邮件规则",
+        "场景标题：打印机脱机\n详细步骤：1. 检查打印机电源",
+        "场景标题：Wi-Fi 频繁掉线\n详细步骤：1. 忘记网络后重新连接 2. 更新无线网卡驱动",
+    ]),
+    ("Teams meeting no audio", [
+        "场景标题：Teams 会议无声音\n详细步骤：1. 检查扬声器设备 2. 在 Teams 设置里切换音频设备 3. 重启 Teams",
+        "场景标题：电脑蓝屏\n详细步骤：1. 记录蓝屏代码",
+        "场景标题：VPN 无法连接\n详细步骤：1. 重启 GlobalProtect 客户端",
+    ]),
+]
+
+def _pairs():
+    return [[q, d] for q, docs in FIXTURES for d in docs]
+
+def _sigmoid(x):
+    return 1 / (1 + np.exp(-x))
+
+def _throughput(backend, pairs, repeat: int, batch_size: int) -> float:
+    backend.predict(pairs[:2], batch_size=batch_size)  # 预热
+    start = time.perf_counter()
+    for _ in range(repeat):
+        backend.predict(pairs, batch_size=batch_size)
+    return len(pairs) * repeat / (time.perf_counter() - start)
+
+def _top1_agreement(ref: np.ndarray, cand: np.ndarray) -> float:
+    agree, offset = 0, 0
+    for _, docs in FIXTURES:
+        n = len(docs)
+        agree += int(np.argmax(ref[offset:offset + n]) == np.argmax(cand[offset:offset + n]))
+        offset += n
+    return agree / len(FIXTURES)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare reranker backends against fp32 torch.")
+    parser.add_argument("--backends", nargs="+", default=["int8", "onnx"])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=Config.RERANK_INTRAOP_THREADS,
+                        help="process-wide torch intra-op threads (torch.set_num_threads)")
+    parser.add_argument("--batch-size", type=int, default=Config.RERANK_MAX_BATCH)
+    args = parser.parse_args()
+
+    if args.threads > 0:
+        torch.set_num_threads(args.threads)
+
+    # 把评测集复制几份，让每轮有足够多的 pair
+    pairs = _pairs() * 4
+
+    print(f"🚀 Loading fp32 reference ({MODEL_NAME}) ...")
+    ref = load_backend("torch", MODEL_NAME, "cpu")
+    ref_scores = _sigmoid(ref.predict(_pairs(), batch_size=args.batch_size))
+    ref_tput = _throughput(ref, pairs, args.repeat, args.batch_size)
+    print(f"   torch : {ref_tput:8.1f} pairs/s")
+
+    for name in args.backends:
+        print(f"🚀 Loading {name} ...")
+        cand = load_backend(name, MODEL_NAME, "cpu", onnx_dir=Config.RERANK_ONNX_DIR)
+        scores = _sigmoid(cand.predict(_pairs(), batch_size=args.batch_size))
+        tput = _throughput(cand, pairs, args.repeat, args.batch_size)
+        diff = np.abs(scores - ref_scores)
+        print(
+            f"   {name:6s}: {tput:8.1f} pairs/s ({tput / ref_tput:.2f}x) | "
+            f"max |Δscore| {diff.max():.4f} | mean |Δscore| {diff.mean():.4f} | "
+            f"top-1 agreement {_top1_agreement(ref_scores, scores):.0%}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+网络搜索吞吐基准：本地起一个 Tavily 替身服务 (标准库 http.server，固定延迟)，不需要外网。
+对比：
+  1. 旧写法：同步 HTTP 请求丢进 asyncio.to_thread (每次新建连接)
+  2. SearchService：httpx 异步长连接 + 并发上限
+  3. SearchService 再跑一遍同样的 query：TTL 缓存命中
+用法: python bench_search.py [--queries 200] [--latency-ms 50] [--concurrency 32]
+"""
+import json
+import time
+import asyncio
+import argparse
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from config.settings import Config
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # 支持 keep-alive
+    latency = 0.05
+    connections = 0
+    requests = 0
+    _lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with self._lock:
+            _StandInHandler.connections += 1
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        with self._lock:
+            _StandInHandler.requests += 1
+        time.sleep(self.latency)
+        payload = json.dumps({"results": [
+            {"title": f"{body.get('query')} #{i}", "url": f"https://example.com/{i}", "content": "stand-in result"}
+            for i in range(body.get("max_results", 3))
+        ]}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def _reset_counters():
+    _StandInHandler.connections = 0
+    _StandInHandler.requests = 0
+
+
+def _report(label: str, n: int, elapsed: float):
+    print(f"{label:<28} {n / elapsed:8.1f} q/s | {elapsed:6.2f}s | "
+          f"upstream requests={_StandInHandler.requests} connections={_StandInHandler.connections}")
+
+
+async def bench_to_thread(base_url: str, queries, concurrency: int):
+    def _search(q):
+        req = urllib.request.Request(
+            f"{base_url}/search",
+            data=json.dumps({"query": q, "max_results": 3}).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(req, timeout=10) as resp:
+            return json.loads(resp.read())
+
+    slots = asyncio.Semaphore(concurrency)
+
+    async def _one(q):
+        async with slots:
+            return await asyncio.to_thread(_search, q)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(_one(q) for q in queries))
+    return time.perf_counter() - start
+
+
+async def bench_service(queries):
+    from services.search import SearchService
+
+    service = SearchService()
+    try:
+        _reset_counters()
+        start = time.perf_counter()
+        await asyncio.gather(*(service.search(q) for q in queries))
+        _report("SearchService (cold)", len(queries), time.perf_counter() - start)
+
+        _reset_counters()
+        start = time.perf_counter()
+        await asyncio.gather(*(service.search(q) for q in queries))
+        _report("SearchService (cached)", len(queries), time.perf_counter() - start)
+        print(f"   cache: {service.cache.stats()}")
+    finally:
+        await service.aclose()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Throughput benchmark for the web search client.")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    _StandInHandler.latency = args.latency_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StandInHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    Config.TAVILY_BASE_URL = base_url
+    Config.SEARCH_CONCURRENCY = args.concurrency
+    queries = [f"VPN连接失败 case {i}" for i in range(args.queries)]
+    print(f"Stand-in Tavily at {base_url} | latency={args.latency_ms}ms | concurrency={args.concurrency}")
+
+    _reset_counters()
+    _report("to_thread + urllib", len(queries), await bench_to_thread(base_url, queries, args.concurrency))
+    await bench_service(queries)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,4 +1,5 @@
 import os
+import json
 from dotenv import load_dotenv
 
 # 1. 加载 .env
@@ -13,6 +14,40 @@ TAVILY_KEY = os.getenv("TAVILY_KEY", "")
 # 路径配置
 INDEX_NAME = os.getenv("INDEX_NAME", "pinecone-study")
 BM25_PATH = os.getenv("BM25_PATH", "/Users/clarence/Desktop/RAG项目/RAG Base/bm25_model.json")
+BM25_BIN_PATH = os.getenv("BM25_BIN_PATH", "")  # 二进制 BM25 模型，默认与 BM25_PATH 同名 .bin
+# IT 领域自定义词典 (it_userdict.txt)：必须和建索引 (Pinecone 稀疏向量 + BM25 doc_freq) 用的词典一致，
+# 现有索引用的是 jieba 默认词典，所以默认不加载；用它重建索引后再设置
+JIEBA_USER_DICT = os.getenv("JIEBA_USER_DICT", "")
+JIEBA_CACHE_DIR = os.getenv("JIEBA_CACHE_DIR", "cache")               # jieba 前缀词典缓存目录
+TOKENIZE_CACHE_SIZE = int(os.getenv("TOKENIZE_CACHE_SIZE", "20000"))
+
+# 检索后端
+RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "pinecone")                   # pinecone / local
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", os.path.join("cache", "kb_snapshot"))  # export_snapshot.py 的输出目录
+PINECONE_POOL_THREADS = int(os.getenv("PINECONE_POOL_THREADS", "8"))  # Pinecone 连接池大小
+PINECONE_TIMEOUT = float(os.getenv("PINECONE_TIMEOUT", "5"))          # 单次 query 超时 (秒)
+PINECONE_SPARSE_INDEX = os.getenv("PINECONE_SPARSE_INDEX", "")        # 融合模式的纯稀疏检索用的 sparse 索引；不配则融合时跳过 sparse 一路
+
+# 网络搜索 (Tavily)
+TAVILY_BASE_URL = os.getenv("TAVILY_BASE_URL", "https://api.tavily.com")  # bench_search.py 会指向本地替身服务
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "3"))
+SEARCH_CONCURRENCY = int(os.getenv("SEARCH_CONCURRENCY", "8"))        # 同时在飞的请求上限 (= 连接池大小)
+SEARCH_TIMEOUT = float(os.getenv("SEARCH_TIMEOUT", "10"))             # 读取超时 (秒)
+SEARCH_CONNECT_TIMEOUT = float(os.getenv("SEARCH_CONNECT_TIMEOUT", "3"))
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "1000"))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "600"))        # 秒；网上的信息会变，不宜太长
+
+# 混合检索打分: native (dense+sparse 一次查询，Pinecone 点积) / convex (两路加权) / rrf (倒数排名融合)
+FUSION_MODE = os.getenv("FUSION_MODE", "native")
+FUSION_ALPHA = float(os.getenv("FUSION_ALPHA", "0.5"))          # convex 模式下 dense 的权重
+RRF_K = int(os.getenv("RRF_K", "60"))
+FUSION_CANDIDATES = int(os.getenv("FUSION_CANDIDATES", "20"))   # 融合模式下每一路的召回深度
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "50"))   # 粗排送进 Rerank 的候选数 (自适应召回的最大深度)
+
+# 自适应召回：先拿少量候选，分数分布太平时才加深到 RERANK_CANDIDATES
+ADAPTIVE_RECALL = os.getenv("ADAPTIVE_RECALL", "true").lower() == "true"
+RECALL_INITIAL_K = int(os.getenv("RECALL_INITIAL_K", "10"))
+RECALL_FLAT_RATIO = float(os.getenv("RECALL_FLAT_RATIO", "0.15"))  # 头尾相对分差低于它就算"平"
 
 # 阈值配置
 try:
@@ -26,6 +61,69 @@ except ValueError:
     MARGIN_FLOOR = 0.03
     HIGH_CONFIDENCE = 0.60
 
+# 快速通道：粗排分数没有歧义就跳过 Rerank；Rerank 分数够高就不等阅卷，后台再审 (services/posthoc.py)
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "true").lower() == "true"
+# 跳过 Rerank 默认关闭：粗排原始分 (dense + sparse 点积) 的量纲随索引 / BM25 权重变化，
+# 阈值没有按自己的索引标定过之前不要打开
+RERANK_SKIP_ENABLED = os.getenv("RERANK_SKIP_ENABLED", "false").lower() == "true"
+RERANK_SKIP_SCORE = float(os.getenv("RERANK_SKIP_SCORE", "1.0"))    # 粗排 Top1 原始分，需按索引标定
+RERANK_SKIP_MARGIN = float(os.getenv("RERANK_SKIP_MARGIN", "0.15")) # 粗排 Top1 - Top2
+ASYNC_GRADE_SCORE = float(os.getenv("ASYNC_GRADE_SCORE", "0.90"))   # BGE Top1 分数
+
+# Rerank
+RERANK_BACKEND = os.getenv("RERANK_BACKEND", "torch")  # torch / int8 / onnx
+RERANK_ONNX_DIR = os.getenv("RERANK_ONNX_DIR", os.path.join("cache", "bge-reranker-onnx"))  # ONNX 导出缓存目录
+RERANK_WORKERS = int(os.getenv("RERANK_WORKERS", "2"))              # CrossEncoder 推理专用线程数
+# torch intra-op 线程数是进程级全局设置 (torch.set_num_threads)，所有 rerank worker 共享同一个线程池，
+# 不是每个 worker 各自一份；0 = torch 默认 (物理核数)。兼容旧的 RERANK_TORCH_THREADS 环境变量
+RERANK_INTRAOP_THREADS = int(os.getenv("RERANK_INTRAOP_THREADS", os.getenv("RERANK_TORCH_THREADS", "0")))
+RERANK_MAX_BATCH = int(os.getenv("RERANK_MAX_BATCH", "64"))         # 跨请求动态批的最大 pair 数
+RERANK_MAX_WAIT_MS = float(os.getenv("RERANK_MAX_WAIT_MS", "10"))   # 动态批最长等待时间
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "50000"))   # 分数缓存条数
+RERANK_CACHE_PATH = os.getenv("RERANK_CACHE_PATH", os.path.join("cache", "rerank_scores.json"))  # 置空则不落盘
+
+# Embedding 批处理
+EMBED_BATCH_MAX = int(os.getenv("EMBED_BATCH_MAX", "64"))            # 单次 embed_content 最多几条
+EMBED_BATCH_WAIT_MS = float(os.getenv("EMBED_BATCH_WAIT_MS", "5"))   # 微批窗口
+
+# Embedding 缓存
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "10000"))
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", os.path.join("cache", "embeddings.sqlite3"))  # 置空则不落盘
+
+# 语义答案缓存
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2000"))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "86400"))
+SEMANTIC_CACHE_MAX_MB = int(os.getenv("SEMANTIC_CACHE_MAX_MB", "64"))  # 含向量矩阵 + 答案 + payload
+KB_VERSION = os.getenv("KB_VERSION", "")  # 重建 Pinecone 索引后改一下，缓存会整体失效
+
+# 多轮对话记忆 (core/memory.py)
+CHECKPOINT_BACKEND = os.getenv("CHECKPOINT_BACKEND", "memory")  # memory / sqlite / none
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", os.path.join("cache", "checkpoints.sqlite3"))
+HISTORY_MAX_TURNS = int(os.getenv("HISTORY_MAX_TURNS", "4"))            # 原文保留的最近轮数 (含当前轮)
+HISTORY_MAX_CHARS = int(os.getenv("HISTORY_MAX_CHARS", "12000"))        # 保留轮次的总字符上限
+HISTORY_SUMMARY_TURNS = int(os.getenv("HISTORY_SUMMARY_TURNS", "10"))   # 摘要最多覆盖几轮
+HISTORY_SUMMARY_CHARS = int(os.getenv("HISTORY_SUMMARY_CHARS", "200"))  # 摘要里每个回答保留的字数
+TOOL_OUTPUT_KEEP_CHARS = int(os.getenv("TOOL_OUTPUT_KEEP_CHARS", "500")) # 历史轮次里工具输出保留的字数
+
+# ReAct 循环上限：超过后强制模型基于已有信息给出最终回答
+MAX_TOOL_ROUNDS = int(os.getenv("MAX_TOOL_ROUNDS", "4"))        # 每轮对话最多几次 agent -> tools
+TURN_BUDGET_S = float(os.getenv("TURN_BUDGET_S", "45"))         # 每轮对话的墙钟预算 (秒)
+
+# 工具执行器 (core/tool_executor.py)：同一步的多个工具调用并发执行
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "30"))                # 默认单个工具超时 (秒)
+TOOL_TIMEOUTS = json.loads(os.getenv("TOOL_TIMEOUTS", '{"search_internet": 15}'))
+TOOL_MAX_CONCURRENCY = int(os.getenv("TOOL_MAX_CONCURRENCY", "8"))   # 默认每个工具的进程级并发上限
+TOOL_CONCURRENCY = json.loads(os.getenv("TOOL_CONCURRENCY", '{"lookup_internal_knowledge": 4}'))
+
+# 工具输出压缩 (services/tool_store.py)：完整输出旁路存储，发给 LLM 的按 token 预算压缩
+TOOL_STORE_SIZE = int(os.getenv("TOOL_STORE_SIZE", "500"))
+TOOL_TOKEN_BUDGET = int(os.getenv("TOOL_TOKEN_BUDGET", "400"))  # 默认每条工具结果的 token 预算
+TOOL_TOKEN_BUDGETS = json.loads(os.getenv(
+    "TOOL_TOKEN_BUDGETS", '{"lookup_internal_knowledge": 800, "search_internet": 500}'
+))
+
 # 调试模式
 ENABLE_DEBUG = os.getenv("ENABLE_DEBUG", "false").lower() == "true"
 
@@ -36,6 +134,20 @@ LLM_MODEL = "qwen3-max"
 ROUTER_MODEL = "qwen-turbo" 
 LLM_BASE_URL = "https://dashscope.aliyuncs.com/compatible-mode/v1"
 
+# LLM 网关 (services/gateway.py)
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "64"))      # httpx 连接池
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "32"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))                    # 读取超时 (秒)
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))      # 每个模型同时在飞的请求数
+LLM_CONCURRENCY = json.loads(os.getenv("LLM_CONCURRENCY", '{"qwen-turbo": 32}'))  # 按模型覆盖
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5")) # 指数退避的基数 (秒)，实际等待在 [0, base * 2^n] 里随机
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "20"))
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "true").lower() == "true"  # ROUTER_MODEL 请求对冲
+LLM_HEDGE_DELAY = float(os.getenv("LLM_HEDGE_DELAY", "1.5"))           # 第一个请求这么久没回来就再发一个 (秒)
+
 # 邮件配置
 SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
 SMTP_PORT = int(os.getenv("SMTP_PORT", "465"))
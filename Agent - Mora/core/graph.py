@@ -1,14 +1,20 @@
+import time
 import asyncio
-from typing import TypedDict, Annotated, List, Literal
+from collections import Counter
+from typing import TypedDict, Annotated, Dict, List, Literal
 from langgraph.graph import StateGraph, END
 from langgraph.graph.message import add_messages
-from langgraph.prebuilt import ToolNode
-from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage, message_chunk_to_message
 from langchain_openai import ChatOpenAI  # 👈 确保导入这个
 
 from config.settings import Config
 from core.prompts import Prompts
+from core.memory import compact_history
+from core.tool_executor import build_tool_executor
+from services.tool_store import tool_store
 from services.llm import llm_service
+from services.gateway import llm_gateway
+from services.registry import registry
 from tools.rag_tool import lookup_internal_knowledge
 from tools.search_tool import search_internet
 
@@ -16,6 +22,9 @@ from tools.search_tool import search_internet
 class AgentState(TypedDict):
     messages: Annotated[List, add_messages]
     original_question: str
+    tool_rounds: int      # 本轮对话已经执行了几次 tools 节点
+    turn_started: float   # 本轮对话开始的时间 (time.monotonic)
+    tool_cache: Dict[str, str]  # 本轮已成功的工具调用 (参数 -> 压缩后的结果)，用于去重
 
 # ============================================================
 # 2. 🔥 修复点：先定义 tools 列表，再绑定给 LLM
@@ -23,15 +32,48 @@ class AgentState(TypedDict):
 tools = [lookup_internal_knowledge, search_internet]
 
 # 3. 初始化 LLM 并绑定工具
-llm = ChatOpenAI(
-    model=Config.LLM_MODEL,
-    api_key=Config.ALI_KEY,
-    base_url=Config.LLM_BASE_URL,
-    temperature=0
-)
+class AgentLLM:
+    """
+    Agent 大脑用的 ChatOpenAI：第一次用到 (或启动预热) 时才构造，import 本模块不会顺带把网关建起来。
+    和 LLMService 共用网关的 httpx 连接池；SDK 自带的重试关掉，由 node_agent 通过 llm_gateway.call 统一
+    占名额 / 退避重试 / 计数
+    """
+    def __init__(self):
+        llm = ChatOpenAI(
+            model=Config.LLM_MODEL,
+            api_key=Config.ALI_KEY,
+            base_url=Config.LLM_BASE_URL,
+            temperature=0,
+            http_async_client=llm_gateway.http_client,
+            max_retries=0,
+        )
+        # 绑定工具 (现在 python 知道 tools 是什么了)
+        self.with_tools = llm.bind_tools(tools)
+        # 强制收尾用：工具定义照样带上 (前缀不变，缓存照样命中)，但 tool_choice=none 不允许再调工具
+        self.final = llm.bind_tools(tools, tool_choice="none")
 
-# 绑定工具 (现在 python 知道 tools 是什么了)
-llm_with_tools = llm.bind_tools(tools)
+agent_llm = registry.lazy("agent_llm", AgentLLM)
+
+# 固定不变的前缀：工具定义 + 同一个 SystemMessage 对象，每轮 ReAct 请求的开头逐字节相同，
+# DashScope 的上下文缓存 (前缀匹配) 才能命中；会变的摘要 / 历史一律放在它后面
+AGENT_SYSTEM_MESSAGE = SystemMessage(content=Prompts.SYSTEM_AGENT)
+# 强制收尾提示以 user 消息追加在末尾：中途的 SystemMessage 很多 chat 模板不认；只发给 LLM，不写进 state
+FORCE_FINAL_MESSAGE = HumanMessage(content=Prompts.SYSTEM_FORCE_FINAL)
+tool_executor = build_tool_executor(tools)
+
+# 每轮对话用了几次工具；被强制收尾的次数 (按原因)
+rounds_per_turn = Counter()
+forced_finals = Counter()
+
+def react_stats() -> dict:
+    turns = sum(rounds_per_turn.values())
+    return {
+        "tools": dict(tool_executor.stats),
+        "turns": turns,
+        "rounds_per_turn": dict(sorted(rounds_per_turn.items())),
+        "avg_rounds": round(sum(k * v for k, v in rounds_per_turn.items()) / turns, 2) if turns else 0.0,
+        "forced_finals": dict(forced_finals),
+    }
 
 # ============================================================
 # 4. 定义节点 (Async)
@@ -49,22 +91,90 @@ async def node_rewrite(state: AgentState):
     new_q = await llm_service.rewrite_query(raw_q, Prompts.SYSTEM_REWRITE)
  
     
-    # 更新消息内容
+    # 更新消息内容；新的一轮对话，工具轮数和计时清零
     last_msg.content = new_q
-    return {"messages": [last_msg], "original_question": raw_q}
+    return {
+        "messages": [last_msg],
+        "original_question": raw_q,
+        "tool_rounds": 0,
+        "turn_started": time.monotonic(),
+        "tool_cache": {},
+    }
 
 async def node_agent(state: AgentState):
     """Agent 大脑"""
-    messages = state["messages"]
-    
-    # 注入 System Prompt
+    # 开了 checkpointer 后 state 里是整段对话，发给 LLM 前按轮压缩 (state 本身不改)
+    recap, messages = compact_history(state["messages"])
+
+    # 注入 System Prompt (固定前缀)；早前对话摘要以一问一答的回顾放在它后面，不再塞第二条 system
     if not isinstance(messages[0], SystemMessage):
-        messages = [SystemMessage(content=Prompts.SYSTEM_AGENT)] + messages
+        messages = [AGENT_SYSTEM_MESSAGE] + recap + messages
         
-    # 异步调用 LLM
-    response = await llm_with_tools.ainvoke(messages)
+    # 工具轮数或本轮耗时超限：不再给模型调工具的机会，逼它用已有信息收尾
+    rounds = state.get("tool_rounds", 0)
+    elapsed = time.monotonic() - state.get("turn_started", time.monotonic())
+    force_reason = None
+    if rounds >= Config.MAX_TOOL_ROUNDS:
+        force_reason = "max_rounds"
+    elif elapsed >= Config.TURN_BUDGET_S:
+        force_reason = "deadline"
+
+    model = agent_llm.with_tools
+    if force_reason:
+        print(f"   [Agent] ⏱️ {force_reason} (rounds={rounds}, elapsed={elapsed:.1f}s) -> forcing final answer")
+        forced_finals[force_reason] += 1
+        messages = messages + [FORCE_FINAL_MESSAGE]
+        model = agent_llm.final
+
+    async def _stream_once():
+        # 流式调用 LLM：token 通过 stream_mode="messages" 实时推给调用方，
+        # 这里把 chunk 累加成完整消息 (tool_calls 也会被拼好)
+        response = None
+        try:
+            async for chunk in model.astream(messages):
+                response = chunk if response is None else response + chunk
+        except Exception as e:
+            if response is None:
+                raise
+            # 已经有 token 推给调用方了，重试会让它们重复出现：包一层，网关不会再重试
+            raise RuntimeError(f"Agent stream broke after the first token: {e}") from e
+        if response is None:
+            # 流里一个 chunk 都没有 (空补全 / 服务端抖动)：退回非流式再要一次
+            print("   [Agent] ⚠️ Empty stream -> retrying without streaming")
+            response = await model.ainvoke(messages)
+        return response
+
+    # 走网关：qwen 主模型的并发名额 / 限流退避重试 / 计数和 LLMService 的调用算在一起
+    response = message_chunk_to_message(await llm_gateway.call(Config.LLM_MODEL, _stream_once))
+
+    if force_reason and response.tool_calls:
+        # 模型不守规矩仍然要调工具：丢掉 tool_calls，保证这一步一定结束
+        response = AIMessage(content=response.content, id=response.id)
+    if not response.tool_calls:
+        rounds_per_turn[rounds] += 1
+        print(f"   [Agent] Turn finished: {rounds} tool rounds, {time.monotonic() - state.get('turn_started', time.monotonic()):.1f}s")
     return {"messages": [response]}
 
+async def node_tools(state: AgentState):
+    """
+    并发执行这一步的全部工具调用 (本轮重复的调用直接复用结果)；
+    完整输出存进 tool_store，写回 messages 的是按 token 预算压缩后的版本
+    """
+    cache = dict(state.get("tool_cache") or {})
+    # 本轮剩余的时间预算：临近截止时开始的工具步，超时也跟着收紧，不会再多跑一整个 TOOL_TIMEOUT
+    remaining = state.get("turn_started", time.monotonic()) + Config.TURN_BUDGET_S - time.monotonic()
+    results = await tool_executor.run(state["messages"][-1].tool_calls, cache, budget=remaining)
+
+    messages = []
+    for r in results:
+        call, content = r["call"], r["content"]
+        if not r["cached"]:
+            content = tool_store.compact(call["name"], call["id"], content)
+            if r["status"] == "success":
+                cache[tool_executor.call_key(call)] = content
+        messages.append(ToolMessage(content=content, name=call["name"], tool_call_id=call["id"], status=r["status"]))
+    return {"messages": messages, "tool_rounds": state.get("tool_rounds", 0) + 1, "tool_cache": cache}
+
 def should_continue(state: AgentState) -> Literal["tools", "__end__"]:
     """路由逻辑：决定是调工具还是结束"""
     messages = state["messages"]
@@ -78,13 +188,14 @@ def should_continue(state: AgentState) -> Literal["tools", "__end__"]:
 # 5. 构建图
 # ============================================================
 
-def build_agent_graph():
+def build_agent_graph(checkpointer=None):
+    """checkpointer 由 core.memory.open_checkpointer() 提供；None 时没有多轮记忆"""
     workflow = StateGraph(AgentState)
     
     # 添加节点
     workflow.add_node("rewrite", node_rewrite)
     workflow.add_node("agent", node_agent)
-    workflow.add_node("tools", ToolNode(tools)) # 使用 LangGraph 自带的 ToolNode
+    workflow.add_node("tools", node_tools) # 并发工具执行器 + 输出压缩
     
     # 设置连线
     workflow.set_entry_point("rewrite")
@@ -98,4 +209,4 @@ def build_agent_graph():
     
     workflow.add_edge("tools", "agent") # 形成闭环：工具用完回 Agent
     
-    return workflow.compile()
\ No newline at end of file
+    return workflow.compile(checkpointer=checkpointer)
\ No newline at end of file
@@ -0,0 +1,102 @@
+"""
+多轮对话记忆：
+- open_checkpointer(): 按 CHECKPOINT_BACKEND 打开 checkpointer (memory / sqlite / none)，传给 build_agent_graph
+- compact_history(): 发给 LLM 之前压缩历史，state 里的完整记录不动
+
+压缩策略 (按 "轮" 处理，一轮 = 一条 HumanMessage 到下一条之前，保证 tool_call 和 ToolMessage 成对)：
+1. 只保留最近 HISTORY_MAX_TURNS 轮原文；更早的轮次压成一段 "问 / 答" 摘要 (不调 LLM，直接截断)，
+   摘要最多覆盖 HISTORY_SUMMARY_TURNS 轮
+2. 保留轮次里，除了当前这一轮，ToolMessage 内容截断到 TOOL_OUTPUT_KEEP_CHARS
+3. 总字符数仍超过 HISTORY_MAX_CHARS，继续把最老的轮次并进摘要 (当前轮永远保留)
+
+摘要以一问一答的 "回顾" 消息对放在历史最前面，而不是第二条 SystemMessage：
+不少 chat 模板只认开头的那一条 system，后面的 system 会被挪动 / 合并甚至报错
+"""
+import os
+from contextlib import asynccontextmanager
+from typing import List, Optional, Tuple
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from config.settings import Config
+
+
+@asynccontextmanager
+async def open_checkpointer(backend: Optional[str] = None, path: Optional[str] = None):
+    backend = backend or Config.CHECKPOINT_BACKEND
+    if backend == "none":
+        yield None
+    elif backend == "sqlite":
+        # 可选依赖：pip install langgraph-checkpoint-sqlite
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+        path = path or Config.CHECKPOINT_PATH
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        async with AsyncSqliteSaver.from_conn_string(path) as saver:
+            print(f"✅ [Memory] SQLite checkpointer at {path}")
+            yield saver
+    else:
+        from langgraph.checkpoint.memory import MemorySaver
+
+        yield MemorySaver()
+
+
+def _split_turns(messages: List) -> List[List]:
+    turns = []
+    for m in messages:
+        if isinstance(m, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(m)
+    return turns
+
+
+def _text(m) -> str:
+    return m.content if isinstance(m.content, str) else str(m.content)
+
+
+def _clip(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit] + f"...(已截断，原文 {len(text)} 字)"
+
+
+def _summarize_turn(turn: List) -> str:
+    question = next((_text(m) for m in turn if isinstance(m, HumanMessage)), "")
+    answer = next((_text(m) for m in reversed(turn) if isinstance(m, AIMessage) and not m.tool_calls), "")
+    return f"- 问: {_clip(question, 100)}\n  答: {_clip(answer, Config.HISTORY_SUMMARY_CHARS)}"
+
+
+def _trim_tools(turn: List) -> List:
+    trimmed = []
+    for m in turn:
+        if isinstance(m, ToolMessage) and len(_text(m)) > Config.TOOL_OUTPUT_KEEP_CHARS:
+            m = m.model_copy(update={"content": _clip(_text(m), Config.TOOL_OUTPUT_KEEP_CHARS)})
+        trimmed.append(m)
+    return trimmed
+
+
+def _size(turns: List[List]) -> int:
+    return sum(len(_text(m)) for turn in turns for m in turn)
+
+
+RECAP_ACK = "好的，我已了解之前的对话，请继续。"
+
+
+def compact_history(messages: List) -> Tuple[List, List]:
+    """返回 (早前对话回顾消息对 or [], 压缩后的消息列表)"""
+    turns = _split_turns(messages)
+    if not turns:
+        return [], []
+
+    keep = max(1, Config.HISTORY_MAX_TURNS)
+    old, recent = turns[:-keep], turns[-keep:]
+    recent = [_trim_tools(t) for t in recent[:-1]] + [recent[-1]]
+
+    while len(recent) > 1 and _size(recent) > Config.HISTORY_MAX_CHARS:
+        old.append(recent.pop(0))
+
+    compacted = [m for turn in recent for m in turn]
+    if not old:
+        return [], compacted
+
+    print(f"   [Memory] {len(messages)} msgs -> {len(compacted)} msgs ({len(old)} earlier turns summarized)")
+    # 摘要本身也要有上限，再早的轮次直接丢弃
+    summary = "【早前对话摘要】\n" + "\n".join(_summarize_turn(t) for t in old[-Config.HISTORY_SUMMARY_TURNS:])
+    return [HumanMessage(content=summary), AIMessage(content=RECAP_ACK)], compacted
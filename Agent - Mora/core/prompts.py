@@ -15,6 +15,10 @@ class Prompts:
     
     """
 
+    # 工具轮数 / 本轮耗时超限时追加在消息末尾，逼模型用已有信息收尾
+    SYSTEM_FORCE_FINAL = """【系统提示】本轮已经达到工具调用上限或时间预算，不能再调用任何工具。
+    请基于上面已经拿到的信息直接给出最终回答；信息不足的地方如实说明，并建议用户联系 IT 服务台。"""
+
     SYSTEM_REWRITE = """你是一个专业的 IT 搜索优化专家。你的任务是优化用户的输入。
     规则：
     1. 去除口语化和主语词汇。
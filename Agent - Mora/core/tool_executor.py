@@ -0,0 +1,99 @@
+"""
+并发工具执行器 (替换 LangGraph 自带的 ToolNode)：
+- 同一步里的多个 tool_calls 用 asyncio.gather 并发跑，复合问题的耗时从 "相加" 变成 "取最大"
+- 每个工具单独的超时和并发上限 (进程级 Semaphore，多个会话共享)；
+  超时再和本轮剩余的时间预算取较小值，工具步不会超出 TURN_BUDGET_S 太多；
+  排队等名额的时间也算在超时里
+- 同一轮对话里参数完全相同的调用只执行一次 (同一步内去重 + 跨步复用已成功的结果)
+"""
+import json
+import asyncio
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from config.settings import Config
+
+
+class ToolExecutor:
+    def __init__(self, tools: list, default_timeout: float, timeouts: dict,
+                 default_concurrency: int, concurrency: dict):
+        self.tools = {t.name: t for t in tools}
+        self.default_timeout = default_timeout
+        self.timeouts = timeouts
+        self._slots = {
+            name: asyncio.Semaphore(concurrency.get(name, default_concurrency)) for name in self.tools
+        }
+        self.stats = Counter()
+
+    @staticmethod
+    def call_key(call: dict) -> str:
+        return f"{call['name']}:{json.dumps(call['args'], sort_keys=True, ensure_ascii=False)}"
+
+    async def _invoke(self, name: str, args: dict, budget: Optional[float] = None) -> Tuple[str, str]:
+        """返回 (content, status)；超时和异常都转成给模型看的错误文本，不让一个工具拖垮整步"""
+        tool = self.tools.get(name)
+        if tool is None:
+            self.stats["errors"] += 1
+            return f"【工具错误】未知工具: {name}", "error"
+
+        timeout = self.timeouts.get(name, self.default_timeout)
+        if budget is not None and budget < timeout:
+            timeout = max(budget, 0.0)
+            self.stats["budget_capped"] += 1
+        try:
+            # 计时从排队开始：名额被其他会话占满时，等名额也会吃掉本轮的时间预算
+            async with asyncio.timeout(timeout):
+                async with self._slots[name]:
+                    result = await tool.ainvoke(args)
+            self.stats["executed"] += 1
+            return str(result), "success"
+        except TimeoutError:
+            self.stats["timeouts"] += 1
+            print(f"   [Tools] ⏱️ {name} timed out after {timeout:.0f}s")
+            return f"【工具超时】{name} 在 {timeout:.0f} 秒内没有返回，请基于已有信息回答或换个方式查询。", "error"
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"   [Tools] ❌ {name} failed: {e}")
+            return f"【工具错误】{name} 执行失败: {e}", "error"
+
+    async def run(self, calls: List[dict], seen: Dict[str, str], budget: Optional[float] = None) -> List[dict]:
+        """
+        执行一步里的全部 tool_calls，结果顺序与 calls 一致。
+        seen: 本轮对话里已经成功过的调用 (call_key -> 结果)，命中的直接复用。
+        budget: 本轮剩余的时间预算 (秒)，每个工具的超时不超过它；None 表示不限
+        返回 [{"call", "content", "status", "cached"}]
+        """
+        unique = {}
+        for call in calls:
+            key = self.call_key(call)
+            if key not in seen and key not in unique:
+                unique[key] = call
+
+        if len(unique) > 1:
+            self.stats["parallel_steps"] += 1
+            print(f"   [Tools] Running {len(unique)} tool calls concurrently")
+        outputs = await asyncio.gather(*(self._invoke(c["name"], c["args"], budget) for c in unique.values()))
+        fresh = dict(zip(unique, outputs))
+
+        results, executed = [], set()
+        for call in calls:
+            key = self.call_key(call)
+            if key in fresh and key not in executed:
+                content, status = fresh[key]
+                executed.add(key)
+                results.append({"call": call, "content": content, "status": status, "cached": False})
+            else:
+                # 同一步里的重复调用，或者本轮早些时候已经查过
+                self.stats["deduplicated"] += 1
+                content, status = (seen[key], "success") if key in seen else fresh[key]
+                results.append({"call": call, "content": content, "status": status, "cached": True})
+        return results
+
+
+def build_tool_executor(tools: list) -> ToolExecutor:
+    return ToolExecutor(
+        tools,
+        default_timeout=Config.TOOL_TIMEOUT,
+        timeouts=Config.TOOL_TIMEOUTS,
+        default_concurrency=Config.TOOL_MAX_CONCURRENCY,
+        concurrency=Config.TOOL_CONCURRENCY,
+    )
@@ -0,0 +1,25 @@
+"""
+把 Pinecone 索引导出为本地快照，供 RETRIEVAL_BACKEND=local 使用。
+用法: python export_snapshot.py [--out 目录] [--namespace ns]
+导出后把 RETRIEVAL_BACKEND 设为 local 即可离线检索；重新导出会刷新快照版本，语义缓存随之失效。
+"""
+import time
+import argparse
+from pinecone import Pinecone
+from config.settings import Config
+from services.retrieval import export_pinecone_snapshot
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the Pinecone index to a local snapshot.")
+    parser.add_argument("--out", default=Config.LOCAL_INDEX_DIR)
+    parser.add_argument("--namespace", default="")
+    args = parser.parse_args()
+
+    index = Pinecone(api_key=Config.PINECONE_KEY).Index(Config.INDEX_NAME)
+    print(f"🚀 Exporting {Config.INDEX_NAME} -> {args.out}")
+    start = time.perf_counter()
+    count = export_pinecone_snapshot(index, args.out, Config.INDEX_NAME, namespace=args.namespace)
+    print(f"✅ {count} vectors exported in {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,18 @@ import asyncio
 import traceback
 import json
 from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
-from core.graph import build_agent_graph
+from core.graph import build_agent_graph, react_stats
+from core.memory import open_checkpointer
 from services.notification import notification_service
+from services.registry import registry
+from services.vector import vec_service
+from services.rerank import rerank_service
+from services.posthoc import posthoc
+from services.search import search_service
+from services.gateway import llm_gateway
+from services.tool_store import tool_store
+from services.semantic_cache import semantic_cache
+from config.settings import Config
 
 # --- 辅助函数：美化打印 ---
 def print_step(title, content, color="white"):
@@ -13,27 +23,63 @@ def print_step(title, content, color="white"):
     print(content)
     print("=" * 60 + "\n")
 
+async def on_posthoc_reject(event):
+    """快速通道的答案被后台阅卷打回：提醒用户并报警"""
+    print(f"\n🔁 [Correction] 上一条知识库回答可能不准确，请谨慎参考。原因: {event['reason']}")
+    await notification_service.send_alert_async(
+        "Posthoc_Grader",
+        f"Fast-path answer rejected: {event['reason']}",
+        f"Query: {event['question']}\nAnswer: {event['answer'][:300]}",
+    )
+
 async def main():
     print("正在初始化 Agent (Debug Mode)...")
-    app = build_agent_graph()
+    async with open_checkpointer() as checkpointer:
+        await chat_loop(build_agent_graph(checkpointer=checkpointer))
+
+async def chat_loop(app):
+    await registry.warmup()
+    posthoc.add_hook(on_posthoc_reject)
     
     print("\n" + "#"*60)
     print("🚀 Mars IT Agent | 全链路监控模式")
     print("#"*60)
 
-    config = {"configurable": {"thread_id": "debug_user_1"}}
+    session = 1
+    config = {"configurable": {"thread_id": f"debug_user_{session}"}}
 
     while True:
         try:
             user_input = input("\n👤 User: ").strip()
             if user_input.lower() in ["exit", "quit"]: break
             if not user_input: continue
+            if user_input.lower() == "reset":
+                # 换一个 thread_id 就是一段全新的对话
+                session += 1
+                config = {"configurable": {"thread_id": f"debug_user_{session}"}}
+                print(f"🆕 New conversation: {config['configurable']['thread_id']}")
+                continue
 
             # 构造输入
             inputs = {"messages": [HumanMessage(content=user_input)]}
             
             # 🔥 核心监控循环
-            async for event in app.astream(inputs, config=config):
+            # messages 通道：agent 节点的 token 流；updates 通道：每个节点的状态更新
+            streaming = False
+            async for mode, event in app.astream(inputs, config=config, stream_mode=["messages", "updates"]):
+
+                if mode == "messages":
+                    chunk, metadata = event
+                    if metadata.get("langgraph_node") == "agent" and chunk.content:
+                        if not streaming:
+                            print("\n🗣️ ", end="", flush=True)
+                            streaming = True
+                        print(chunk.content, end="", flush=True)
+                    continue
+
+                if streaming:
+                    print()
+                    streaming = False
                 
                 # event 是一个字典，key 是节点名，value 是该节点更新的状态
                 for node_name, state_update in event.items():
@@ -66,7 +112,7 @@ async def main():
                         else:
                             print_step("AGENT (FINAL ANSWER)", 
                                        f"💡 思考结果: 信息充足，准备输出。\n"
-                                       f"🗣️ 回复内容: {msg.content}")
+                                       f"🗣️ 回复内容 (已流式输出 {len(msg.content)} 字)")
 
                     # 3. 监控 [Tools] 节点 (工具执行结果)
                     elif node_name == "tools":
@@ -74,8 +120,13 @@ async def main():
                         tool_outputs = []
                         for m in msgs:
                             if isinstance(m, ToolMessage):
-                                # 截取前200个字符防止刷屏，想看全量可以去掉切片
-                                content_preview = m.content[:300] + "..." if len(m.content) > 300 else m.content
+                                # messages 里是压缩版；ENABLE_DEBUG 时从 tool_store 取完整输出
+                                full = tool_store.get(m.tool_call_id) if Config.ENABLE_DEBUG else None
+                                if full is not None:
+                                    content_preview = full
+                                else:
+                                    # 截取前300个字符防止刷屏
+                                    content_preview = m.content[:300] + "..." if len(m.content) > 300 else m.content
                                 tool_outputs.append(f"📦 工具({m.name}) 返回:\n{content_preview}")
                         
                         print_step("TOOLS OUTPUT", "\n\n".join(tool_outputs))
@@ -89,5 +140,21 @@ async def main():
             await notification_service.send_alert_async("Main_Loop", err_str, traceback.format_exc())
             continue 
 
+    await posthoc.drain()
+    if registry.is_loaded("search"):
+        await search_service.aclose()
+    if registry.is_loaded("llm_gateway"):
+        await llm_gateway.aclose()
+    print(f"\n📊 [Paths] {posthoc.stats()}")
+    print(f"📊 [Tool Store] {tool_store.stats()}")
+    print(f"📊 [Semantic Cache] {semantic_cache.stats()}")
+    print(f"📊 [ReAct] {react_stats()}")
+    if registry.is_loaded("llm_gateway"):
+        print(f"📊 [LLM Gateway] {llm_gateway.report()}")
+    if registry.is_loaded("vector"):
+        print(f"📊 [Recall] {vec_service.recall_stats()}")
+    if registry.is_loaded("rerank"):
+        print(f"📊 [Rerank Scores] {rerank_service.score_cache.stats()}")
+
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
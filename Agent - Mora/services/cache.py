@@ -0,0 +1,211 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Optional
+import numpy as np
+
+_MISSING = object()
+
+class LRUCache:
+    """线程安全的 LRU 缓存，可选 TTL，带命中统计"""
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (value, created_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                self.misses += 1
+                return default
+            value, created_at = item
+            if self.ttl is not None and time.time() - created_at > self.ttl:
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.time())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def items(self) -> list:
+        """按从旧到新的顺序导出 (key, value)，用于持久化"""
+        with self._lock:
+            return [(k, v) for k, (v, _) in self._data.items()]
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+def normalize_text(text: str) -> str:
+    """NFKC + 去首尾空白 + 合并连续空白；全角/半角、多余空格不同的同一句话共用一个 key"""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+class EmbeddingCache:
+    """
+    两级 embedding 缓存：进程内 LRU + 可选 SQLite 落盘 (重启不丢)。
+    key = sha256(model + 规范化文本)，向量以 little-endian float32 BLOB 存储。
+    内存里存 float32 ndarray (768 维约 3KB；Python float list 要 25KB 左右)，
+    需要 list 的地方 (Pinecone 请求) 自己在边界上转换。
+    SQLite 的 user_version 和 SCHEMA_VERSION 对不上时整表重建，不去读旧格式。
+    """
+    SCHEMA_VERSION = 1
+
+    def __init__(self, model: str, maxsize: int, db_path: str = ""):
+        self.model = model
+        self.memory = LRUCache(maxsize)
+        self.disk_hits = 0
+        self._db = None
+        self._db_lock = threading.Lock()
+        if db_path:
+            self._open_db(db_path)
+
+    def _open_db(self, db_path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        # embedding 在 to_thread 的工作线程里调用，所以允许跨线程，自己加锁
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        version = self._db.execute("PRAGMA user_version").fetchone()[0]
+        if version != self.SCHEMA_VERSION:
+            if version:
+                print(f"⚠️ [EmbeddingCache] Schema v{version} != v{self.SCHEMA_VERSION} -> rebuilding {db_path}")
+            self._db.execute("DROP TABLE IF EXISTS embeddings")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " dim INTEGER NOT NULL,"
+            " vec BLOB NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        self._db.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+        self._db.commit()
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\x00{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        key = self._key(text)
+        vec = self.memory.get(key)
+        if vec is not None or self._db is None:
+            return vec
+
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT vec FROM embeddings WHERE key = ? AND model = ?", (key, self.model)
+            ).fetchone()
+        if row is None:
+            return None
+        vec = np.frombuffer(row[0], dtype="<f4").astype(np.float32)
+        vec.flags.writeable = False
+        self.disk_hits += 1
+        self.memory.put(key, vec)
+        return vec
+
+    def put(self, text: str, vec) -> np.ndarray:
+        """写入缓存，返回缓存里的那份 float32 向量 (只读，多个请求共享)"""
+        key = self._key(text)
+        vec = np.array(vec, dtype=np.float32)
+        vec.flags.writeable = False
+        self.memory.put(key, vec)
+        if self._db is None:
+            return vec
+        blob = vec.astype("<f4").tobytes()
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO embeddings (key, model, dim, vec, created_at) VALUES (?, ?, ?, ?, ?)",
+                (key, self.model, len(vec), blob, time.time())
+            )
+            self._db.commit()
+        return vec
+
+    def stats(self) -> dict:
+        return {**self.memory.stats(), "disk_hits": self.disk_hits, "disk_enabled": self._db is not None}
+
+
+class ScoreCache:
+    """
+    Cross-Encoder 分数缓存：key = 规范化 query + 文档 id + name/steps 内容哈希，
+    文档内容改了哈希就变，旧分数自然失效。可落盘为 JSON，启动时重新加载。
+    namespace (模型名 + 推理后端) 写在文件头里，加载时对不上 (换了模型 / torch→int8→onnx) 整份丢弃，
+    不同模型 / 量化方式打出来的分数不能混用。
+    """
+    def __init__(self, maxsize: int, path: str = "", namespace: str = ""):
+        self.path = path
+        self.namespace = namespace
+        self.memory = LRUCache(maxsize)
+        if path and os.path.exists(path):
+            self.load(path)
+
+    @staticmethod
+    def make_key(query: str, doc: dict) -> str:
+        meta = doc.get("metadata", {})
+        content = f"{meta.get('name', '')}\x00{meta.get('steps', '')}"
+        content_hash = hashlib.sha1(content.encode("utf-8")).hexdigest()[:16]
+        return f"{normalize_text(query)}\x00{doc.get('id', '')}\x00{content_hash}"
+
+    def get(self, key: str) -> Optional[float]:
+        return self.memory.get(key)
+
+    def put(self, key: str, score: float):
+        self.memory.put(key, score)
+
+    def save(self, path: str = ""):
+        path = path or self.path
+        if not path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"namespace": self.namespace, "scores": dict(self.memory.items())}, f, ensure_ascii=False)
+        os.replace(tmp, path)  # 原子替换，写一半崩了也不会坏掉旧文件
+
+    def load(self, path: str):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ [ScoreCache] Failed to load {path}: {e}")
+            return
+        # 旧格式 (没有文件头) 也当作对不上
+        if not isinstance(data, dict) or data.get("namespace") != self.namespace or "scores" not in data:
+            found = data.get("namespace") if isinstance(data, dict) else None
+            print(f"⚠️ [ScoreCache] {path} was built for {found!r}, now {self.namespace!r} -> ignored")
+            return
+        for key, score in data["scores"].items():
+            self.memory.put(key, float(score))
+        print(f"✅ [ScoreCache] Loaded {len(self.memory)} scores from {path}")
+
+    def stats(self) -> dict:
+        return self.memory.stats()
@@ -0,0 +1,169 @@
+import random
+import asyncio
+from collections import Counter
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional
+from config.settings import Config
+from services.registry import registry
+
+class LLMGateway:
+    """
+    进程内共享的 LLM 网关 (DashScope OpenAI 兼容接口)，所有 LLM 调用都从这里走：
+    - 一个调好参数的 httpx 连接池，AsyncOpenAI 共用 (keep-alive，不再每个服务各建一套)
+    - 每个模型一个 Semaphore：突发流量在本地排队，而不是一起压到 DashScope 触发限流
+    - 429 / 5xx / 超时 / 连接错误：带抖动的指数退避重试，服务端给了 Retry-After 就按它来
+    - ROUTER_MODEL 这类小模型的请求对冲：第一个请求 LLM_HEDGE_DELAY 秒内没回来就再发一个，谁先回用谁
+    """
+    def __init__(self):
+        import httpx
+        from openai import AsyncOpenAI
+
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=Config.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=Config.LLM_MAX_KEEPALIVE,
+                keepalive_expiry=Config.LLM_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(Config.LLM_TIMEOUT, connect=Config.LLM_CONNECT_TIMEOUT),
+        )
+        # SDK 自带的重试关掉，统一由网关按限流信号重试
+        self.client = AsyncOpenAI(
+            api_key=Config.ALI_KEY,
+            base_url=Config.LLM_BASE_URL,
+            http_client=self.http_client,
+            max_retries=0,
+        )
+        self.hedge_models = {Config.ROUTER_MODEL} if Config.LLM_HEDGE_ENABLED else set()
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+        self.stats = Counter()
+
+    def _slot(self, model: str) -> asyncio.Semaphore:
+        if model not in self._slots:
+            self._slots[model] = asyncio.Semaphore(Config.LLM_CONCURRENCY.get(model, Config.LLM_MAX_CONCURRENCY))
+        return self._slots[model]
+
+    @staticmethod
+    def _retry_after(e: Exception) -> Optional[float]:
+        response = getattr(e, "response", None)
+        if response is None:
+            return None
+        headers = response.headers
+        if headers.get("retry-after-ms"):
+            try:
+                return float(headers["retry-after-ms"]) / 1000
+            except ValueError:
+                pass
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            try:
+                return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0.0)
+            except (TypeError, ValueError):
+                return None
+
+    @staticmethod
+    def _retryable(e: Exception) -> bool:
+        import openai
+
+        if isinstance(e, (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError)):
+            return True
+        return isinstance(e, openai.APIStatusError) and e.status_code >= 500
+
+    def _backoff(self, attempt: int, e: Exception) -> float:
+        retry_after = self._retry_after(e)
+        if retry_after is not None:
+            return min(retry_after, Config.LLM_RETRY_MAX_DELAY)
+        # full jitter：并发请求同时被限流时，各自错开重试时间
+        return random.uniform(0, min(Config.LLM_RETRY_MAX_DELAY, Config.LLM_RETRY_BASE_DELAY * 2 ** attempt))
+
+    async def _with_retry(self, model: str, call: Callable[[], Awaitable]):
+        for attempt in range(Config.LLM_MAX_RETRIES + 1):
+            try:
+                return await call()
+            except Exception as e:
+                if attempt >= Config.LLM_MAX_RETRIES or not self._retryable(e):
+                    self.stats["failures"] += 1
+                    raise
+                delay = self._backoff(attempt, e)
+                self.stats["retries"] += 1
+                if getattr(e, "status_code", None) == 429:
+                    self.stats["rate_limited"] += 1
+                print(f"⚠️ [LLM Gateway] {type(e).__name__} on {model}, retry {attempt + 1} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    @asynccontextmanager
+    async def slot(self, model: str):
+        """占该模型的一个并发名额并计入 requests；给不经过 self.client 的调用 (Agent 的 ChatOpenAI) 用"""
+        async with self._slot(model):
+            self.stats["requests"] += 1
+            yield
+
+    async def call(self, model: str, call: Callable[[], Awaitable]):
+        """
+        外部构造的请求也走网关：每次尝试都占一个名额，失败按同样的退避 / Retry-After 策略重试。
+        call 里需要关掉 SDK 自己的重试 (max_retries=0)，否则两层重试叠加
+        """
+        async def _attempt():
+            async with self.slot(model):
+                return await call()
+        return await self._with_retry(model, _attempt)
+
+    async def _call_once(self, kwargs: dict):
+        async with self.slot(kwargs["model"]):
+            return await self.client.chat.completions.create(**kwargs)
+
+    async def _hedged(self, kwargs: dict):
+        model = kwargs["model"]
+        first = asyncio.create_task(self._with_retry(model, lambda: self._call_once(kwargs)))
+        tasks = [first]
+        try:
+            done, _ = await asyncio.wait({first}, timeout=Config.LLM_HEDGE_DELAY)
+            if done:
+                return first.result()
+
+            self.stats["hedged"] += 1
+            second = asyncio.create_task(self._with_retry(model, lambda: self._call_once(kwargs)))
+            tasks.append(second)
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.stats["hedge_wins"] += 1
+                        return task.result()
+            # 两个都失败了
+            raise first.exception()
+        finally:
+            # 输掉的那一路 (或者调用方自己被取消时的全部请求) 直接取消
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def chat(self, **kwargs):
+        """非流式 chat.completions.create；对冲模型走 _hedged"""
+        if kwargs["model"] in self.hedge_models:
+            return await self._hedged(kwargs)
+        return await self._with_retry(kwargs["model"], lambda: self._call_once(kwargs))
+
+    async def stream(self, **kwargs) -> AsyncIterator:
+        """流式调用：整个流的生命周期都占着该模型的一个名额；只在建立连接阶段重试 (已经吐出的 token 无法重放)"""
+        async with self.slot(kwargs["model"]):
+            stream = await self._with_retry(
+                kwargs["model"], lambda: self.client.chat.completions.create(stream=True, **kwargs)
+            )
+            async for chunk in stream:
+                yield chunk
+
+    def report(self) -> dict:
+        return dict(self.stats)
+
+    async def aclose(self):
+        await self.http_client.aclose()
+
+llm_gateway = registry.lazy("llm_gateway", LLMGateway)
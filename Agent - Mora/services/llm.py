@@ -1,16 +1,14 @@
 import json
-from openai import AsyncOpenAI  # 👈 注意：导入 AsyncOpenAI
 from config.settings import Config
+from services.gateway import llm_gateway
+from services.registry import registry
 
 class LLMService:
-    def __init__(self):
-        # 使用异步客户端
-        self.client = AsyncOpenAI(api_key=Config.ALI_KEY, base_url=Config.LLM_BASE_URL)
+    """业务层的 LLM 调用；连接池、并发上限、重试、对冲都在 services/gateway.py 里统一处理"""
 
     async def generate(self, system_prompt: str, user_prompt: str, temp: float = 0.2) -> str:
         try:
-            # 注意 await
-            response = await self.client.chat.completions.create(
+            response = await llm_gateway.chat(
                 model=Config.LLM_MODEL,
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -25,8 +23,7 @@ class LLMService:
 
     async def rewrite_query(self, text: str, prompt: str) -> str:
         try:
-            # 注意 await
-            response = await self.client.chat.completions.create(
+            response = await llm_gateway.chat(
                 model=Config.ROUTER_MODEL,
                 messages=[
                     {"role": "system", "content": prompt}, 
@@ -36,13 +33,13 @@ class LLMService:
             )
             return response.choices[0].message.content.strip()
         except Exception as e:
+            # 网关已经重试过了，这里才兜底
             print(f"❌ [LLM Rewrite Error] {e}")
             return text
 
     async def route_request(self, text: str, prompt: str) -> dict:
         try:
-            # 注意 await
-            response = await self.client.chat.completions.create(
+            response = await llm_gateway.chat(
                 model=Config.ROUTER_MODEL,
                 messages=[
                     {"role": "system", "content": prompt}, 
@@ -56,4 +53,23 @@ class LLMService:
             print(f"❌ [LLM Route Error] {e}")
             return {"score": "yes"}
 
-llm_service = LLMService()
\ No newline at end of file
+    async def grade_answer(self, text: str, system_prompt: str) -> dict:
+        """
+        阅卷专用：不兜底。调用失败 / 返回里没有 yes|no 都直接抛异常，
+        调用方按 "没通过阅卷" 处理 (不写语义缓存)，而不是像 route_request 那样默认放行
+        """
+        response = await llm_gateway.chat(
+            model=Config.ROUTER_MODEL,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": text}
+            ],
+            temperature=0.0,
+            response_format={"type": "json_object"}
+        )
+        result = json.loads(response.choices[0].message.content)
+        if result.get("score") not in ("yes", "no"):
+            raise ValueError(f"Grader returned no yes/no score: {result}")
+        return result
+
+llm_service = registry.lazy("llm", LLMService)
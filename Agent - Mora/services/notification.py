@@ -4,6 +4,7 @@ import threading
 import asyncio
 from email.mime.text import MIMEText
 from config.settings import Config  # 👈 修正引用
+from services.registry import registry
 
 # 尝试导入 logger，如果没有定义则使用 print 代替，防止报错
 try:
@@ -115,4 +116,4 @@ Mars Agent 触发了自动降级保护 (Via Official Gmail API).
         """
         self.send_alert(module_name, error_msg, detail)
 
-notification_service = NotificationService()
\ No newline at end of file
+notification_service = registry.lazy("notification", NotificationService)
\ No newline at end of file
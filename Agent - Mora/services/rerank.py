@@ -1,25 +1,70 @@
-import torch
+import atexit
 import numpy as np
-from sentence_transformers import CrossEncoder
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any
+from config.settings import Config
+from services.batcher import MicroBatcher
+from services.cache import ScoreCache
+from services.rerank_backends import load_backend
+from services.registry import registry
+
+_intraop_configured = False
+
+def configure_intraop_threads(torch) -> None:
+    """
+    torch.set_num_threads 是进程级全局设置：RERANK_WORKERS 个推理线程共用同一个 intra-op 线程池，
+    所以只在初始化时设一次，不在 worker 路径里反复设。
+    """
+    global _intraop_configured
+    if _intraop_configured or Config.RERANK_INTRAOP_THREADS <= 0:
+        return
+    torch.set_num_threads(Config.RERANK_INTRAOP_THREADS)
+    _intraop_configured = True
+    print(f"   [Rerank] torch intra-op threads (process-wide) = {Config.RERANK_INTRAOP_THREADS}")
 
 class RerankService:
     def __init__(self):
+        # torch 很重 (import 就要 1~2 秒)，延迟到真正构造时
+        import torch
+
         # 💡 使用 BGE v1.5 模型，这是目前最推荐的版本
         # 如果显存不够 (小于 4GB)，可以将 large 改为 base: "BAAI/bge-reranker-v1.5-base"
         self.model_name = "BAAI/bge-reranker-base"
         
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         print(f"🚀 [Rerank] Loading model: {self.model_name} on {self.device}...")
+
+        configure_intraop_threads(torch)
         
         # max_length=512 是 BGE 的标准窗口，超过会自动截断
-        self.model = CrossEncoder(self.model_name, max_length=512, device=self.device)
-        print("✅ [Rerank] Model loaded successfully.")
+        # 后端可选 torch (fp32) / int8 (动态量化) / onnx (ONNX Runtime)，rerank() 的输入输出不变
+        self.model = load_backend(
+            Config.RERANK_BACKEND, self.model_name, self.device, max_length=512, onnx_dir=Config.RERANK_ONNX_DIR
+        )
+        print(f"✅ [Rerank] Model loaded successfully (backend={self.model.name}).")
+
+        # CPU 推理放到专用线程池，不占事件循环，也不和 to_thread 的 IO 任务抢默认线程池
+        self.executor = ThreadPoolExecutor(max_workers=Config.RERANK_WORKERS, thread_name_prefix="rerank")
+        # 跨请求动态批：并发请求的 [query, doc] 对攒到一起做一次 predict
+        self.batcher = MicroBatcher(
+            self._predict_batch, Config.RERANK_MAX_BATCH, Config.RERANK_MAX_WAIT_MS, executor=self.executor
+        )
+        # 同一个 query 经常命中同一批文档，算过的分数直接复用；退出时落盘
+        self.score_cache = ScoreCache(
+            Config.RERANK_CACHE_SIZE, Config.RERANK_CACHE_PATH, namespace=f"{self.model_name}|{self.model.name}"
+        )
+        atexit.register(self.score_cache.save)
 
     def _sigmoid(self, x):
         """将 Logits 转换为 0~1 的概率值，方便做阈值过滤"""
         return 1 / (1 + np.exp(-x))
 
+    def _predict_batch(self, pairs: List[List[str]]) -> List[float]:
+        """同步推理一整批 (可能来自多个请求)，返回 sigmoid 归一化后的分数"""
+        # BGE 返回的是 logits
+        logits = self.model.predict(pairs, batch_size=Config.RERANK_MAX_BATCH)
+        return [float(self._sigmoid(x)) for x in logits]
+
     async def rerank(self, query: str, docs: List[Dict[str, Any]], top_k: int = 5) -> List[Dict[str, Any]]:
         """
         执行重排序
@@ -47,19 +92,21 @@ class RerankService:
             # 3. 传入模型
             pairs.append([query, rich_content])
 
-        # 2. 推理 (Predict)
-        # BGE 返回的是 logits
-        scores = self.model.predict(pairs)
+        # 2. 查分数缓存，只有没见过的 pair 才需要推理
+        keys = [ScoreCache.make_key(query, doc) for doc in docs]
+        scores = [self.score_cache.get(k) for k in keys]
+        todo = [i for i, s in enumerate(scores) if s is None]
 
-        # 3. 如果只有 1 个文档，scores 可能是 scalar，需要转一下
-        if len(docs) == 1:
-            scores = [scores]
+        # 3. 推理 (Predict)：交给动态批，和其他请求的 pairs 一起在 rerank 线程池里算
+        if todo:
+            fresh = await self.batcher.submit_many([pairs[i] for i in todo])
+            for i, score in zip(todo, fresh):
+                scores[i] = score
+                self.score_cache.put(keys[i], score)
 
-        # 4. 回写分数并归一化
-        for i, doc in enumerate(docs):
-            # 使用 Sigmoid 归一化，使其变成 0.95, 0.12 这种可读分数
-            norm_score = float(self._sigmoid(scores[i]))
-            doc['score'] = norm_score
+        # 4. 回写分数 (已经是 Sigmoid 归一化后的 0.95, 0.12 这种可读分数)
+        for doc, score in zip(docs, scores):
+            doc['score'] = score
 
         # 5. 排序：按分数从高到低
         ranked_docs = sorted(docs, key=lambda x: x['score'], reverse=True)
@@ -68,4 +115,4 @@ class RerankService:
         return ranked_docs[:top_k]
 
 # 单例导出
-rerank_service = RerankService()
\ No newline at end of file
+rerank_service = registry.lazy("rerank", RerankService)
\ No newline at end of file
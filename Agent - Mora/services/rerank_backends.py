@@ -0,0 +1,73 @@
+import os
+import numpy as np
+from typing import List
+
+class TorchBackend:
+    """原版：PyTorch fp32 CrossEncoder"""
+    name = "torch"
+
+    def __init__(self, model_name: str, device: str, max_length: int = 512):
+        from sentence_transformers import CrossEncoder
+        self.model = CrossEncoder(model_name, max_length=max_length, device=device)
+
+    def predict(self, pairs: List[List[str]], batch_size: int = 32) -> np.ndarray:
+        """返回 logits"""
+        return np.atleast_1d(self.model.predict(pairs, batch_size=batch_size))
+
+
+class Int8Backend(TorchBackend):
+    """PyTorch 动态量化：Linear 层权重转 int8，只支持 CPU"""
+    name = "int8"
+
+    def __init__(self, model_name: str, device: str, max_length: int = 512):
+        import torch
+        super().__init__(model_name, "cpu", max_length)
+        self.model.model = torch.quantization.quantize_dynamic(
+            self.model.model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+
+
+class OnnxBackend:
+    """ONNX Runtime (CPU)，第一次启动时导出 ONNX 并缓存到 onnx_dir，之后直接加载"""
+    name = "onnx"
+
+    def __init__(self, model_name: str, device: str, max_length: int = 512, onnx_dir: str = ""):
+        from transformers import AutoTokenizer
+        from optimum.onnxruntime import ORTModelForSequenceClassification
+
+        self.max_length = max_length
+        if onnx_dir and os.path.isdir(onnx_dir):
+            self.tokenizer = AutoTokenizer.from_pretrained(onnx_dir)
+            self.model = ORTModelForSequenceClassification.from_pretrained(onnx_dir)
+        else:
+            self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+            self.model = ORTModelForSequenceClassification.from_pretrained(model_name, export=True)
+            if onnx_dir:
+                self.model.save_pretrained(onnx_dir)
+                self.tokenizer.save_pretrained(onnx_dir)
+
+    def predict(self, pairs: List[List[str]], batch_size: int = 32) -> np.ndarray:
+        logits = []
+        for i in range(0, len(pairs), batch_size):
+            chunk = pairs[i:i + batch_size]
+            inputs = self.tokenizer(
+                [p[0] for p in chunk], [p[1] for p in chunk],
+                padding=True, truncation=True, max_length=self.max_length, return_tensors="np"
+            )
+            out = self.model(**inputs)
+            logits.append(np.asarray(out.logits).reshape(-1))
+        return np.concatenate(logits) if logits else np.zeros(0, dtype=np.float32)
+
+
+BACKENDS = {
+    TorchBackend.name: TorchBackend,
+    Int8Backend.name: Int8Backend,
+    OnnxBackend.name: OnnxBackend,
+}
+
+def load_backend(name: str, model_name: str, device: str, max_length: int = 512, onnx_dir: str = ""):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown rerank backend: {name} (choose from {sorted(BACKENDS)})")
+    if name == OnnxBackend.name:
+        return OnnxBackend(model_name, device, max_length, onnx_dir=onnx_dir)
+    return BACKENDS[name](model_name, device, max_length)
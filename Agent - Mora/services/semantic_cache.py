@@ -0,0 +1,165 @@
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, List, Optional
+import numpy as np
+from config.settings import Config
+
+class SemanticCache:
+    """
+    语义答案缓存：用 query 的 dense 向量做余弦相似度查找，命中阈值以上直接返回已通过阅卷的答案。
+    - 向量放在一块预分配的 float32 矩阵里，查找就是一次矩阵乘法
+    - LRU + TTL + 内存上限 三种淘汰
+    - 内存上限 max_bytes 包含向量矩阵本身：矩阵最多占一半，条数上限按维度收紧 (min(max_entries, ...))，
+      剩下的给答案文本 + payload (按 JSON 序列化后的大小计)
+    - 知识库指纹 (Pinecone 索引 / BM25 模型) 变化时整体清空
+    """
+    def __init__(self, threshold: float, max_entries: int, ttl: float, max_bytes: int):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._capacity = max_entries      # 首次写入知道维度后按 max_bytes 收紧
+        self._vecs = None                 # (capacity, dim) 首次写入时按维度分配
+        self._matrix_bytes = 0
+        self._valid = np.zeros(max_entries, dtype=bool)
+        self._lru = OrderedDict()         # slot -> (answer, payload, created_at, nbytes)
+        self._free = list(range(max_entries - 1, -1, -1))
+        self._bytes = 0                   # 答案 + payload，不含矩阵
+        self._fingerprint = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _normalize(vec) -> np.ndarray:
+        v = np.asarray(vec, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm > 0 else v
+
+    def _check_fingerprint(self, fingerprint: str):
+        if fingerprint != self._fingerprint:
+            if self._lru:
+                print(f"   [SemanticCache] 🔄 Knowledge base changed -> drop {len(self._lru)} entries")
+                self.invalidations += 1
+            self._clear()
+            self._fingerprint = fingerprint
+
+    def _clear(self):
+        self._valid[:] = False
+        self._lru.clear()
+        self._free = list(range(self._capacity - 1, -1, -1))
+        self._bytes = 0
+
+    def _allocate(self, dim: int):
+        """矩阵最多占 max_bytes 的一半，放不下 max_entries 行就少分几行"""
+        row_bytes = dim * np.dtype(np.float32).itemsize
+        self._capacity = max(1, min(self.max_entries, (self.max_bytes // 2) // row_bytes))
+        self._vecs = np.zeros((self._capacity, dim), dtype=np.float32)
+        self._matrix_bytes = self._vecs.nbytes
+        self._valid = self._valid[:self._capacity].copy()
+        self._free = [slot for slot in self._free if slot < self._capacity]
+        if self._capacity < self.max_entries:
+            print(f"   [SemanticCache] Capacity {self.max_entries} -> {self._capacity} to fit the memory cap")
+
+    @staticmethod
+    def _entry_bytes(answer: str, payload: Any) -> int:
+        if payload is None:
+            payload_bytes = 0
+        else:
+            payload_bytes = len(json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8"))
+        return len(answer.encode("utf-8")) + payload_bytes
+
+    def _remove(self, slot: int):
+        _, _, _, nbytes = self._lru.pop(slot)
+        self._valid[slot] = False
+        self._free.append(slot)
+        self._bytes -= nbytes
+
+    def lookup(self, vec: Optional[List[float]], fingerprint: str) -> Optional[tuple]:
+        """命中返回 (answer, payload, similarity)，否则 None"""
+        if vec is None:
+            return None
+        with self._lock:
+            self._check_fingerprint(fingerprint)
+            if self._vecs is None or not self._lru:
+                self.misses += 1
+                return None
+
+            q = self._normalize(vec)
+            sims = self._vecs @ q
+            sims[~self._valid] = -1.0
+            now = time.time()
+            while True:
+                slot = int(np.argmax(sims))
+                sim = float(sims[slot])
+                if sim < self.threshold:
+                    self.misses += 1
+                    return None
+
+                answer, payload, created_at, _ = self._lru[slot]
+                if now - created_at <= self.ttl:
+                    break
+                # 最像的那条过期了：踢掉，继续看下一条超过阈值的
+                self._remove(slot)
+                self.evictions += 1
+                sims[slot] = -1.0
+
+            self._lru.move_to_end(slot)
+            self.hits += 1
+            return answer, payload, sim
+
+    def put(self, vec: Optional[List[float]], answer: str, fingerprint: str, payload: Any = None):
+        if vec is None or self.max_entries <= 0:
+            return
+        q = self._normalize(vec)
+        nbytes = self._entry_bytes(answer, payload)
+        with self._lock:
+            self._check_fingerprint(fingerprint)
+            if self._vecs is None:
+                self._allocate(q.shape[0])
+            if self._matrix_bytes + nbytes > self.max_bytes:
+                # 单条就超过上限，不缓存
+                return
+
+            # 淘汰：条数满了 / 内存超了 (矩阵 + 已有条目)，从最久未用的开始踢
+            while self._lru and (not self._free or self._matrix_bytes + self._bytes + nbytes > self.max_bytes):
+                oldest = next(iter(self._lru))
+                self._remove(oldest)
+                self.evictions += 1
+
+            slot = self._free.pop()
+            self._vecs[slot] = q
+            self._valid[slot] = True
+            self._lru[slot] = (answer, payload, time.time(), nbytes)
+            self._bytes += nbytes
+
+    def invalidate(self):
+        with self._lock:
+            self._clear()
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._lru),
+            "capacity": self._capacity,
+            "bytes": self._matrix_bytes + self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+semantic_cache = SemanticCache(
+    threshold=Config.SEMANTIC_CACHE_THRESHOLD,
+    max_entries=Config.SEMANTIC_CACHE_MAX_ENTRIES,
+    ttl=Config.SEMANTIC_CACHE_TTL,
+    max_bytes=Config.SEMANTIC_CACHE_MAX_MB * 1024 * 1024,
+)
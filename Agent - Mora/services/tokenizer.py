@@ -0,0 +1,42 @@
+import os
+import logging
+from config.settings import Config
+from services.cache import LRUCache
+from services.registry import registry
+
+class Tokenizer:
+    """
+    稀疏检索用的 jieba 分词：
+    - 构造时 (启动预热) 就建好前缀词典，而不是等第一个请求触发
+    - 词典缓存放到固定目录，重启直接加载，不用每次重新扫描 dict.txt
+    - 可选 IT 领域自定义词典 (JIEBA_USER_DICT，默认关闭)：query 和索引必须用同一套词典切词，
+      否则 query 切出来的 "VPN连接" "域账号" 这类词在 BM25 doc_freq / Pinecone 稀疏向量里根本不存在，
+      原本能命中的 "VPN" "连接" 反而没了。现有索引是用 jieba 默认词典建的，
+      只有用 it_userdict.txt 重建了稀疏向量和 BM25 模型之后才能打开
+    - 分词结果 LRU 缓存，重复的 query 不再重复切词
+    """
+    def __init__(self):
+        import jieba
+        jieba.setLogLevel(logging.WARNING)
+
+        if Config.JIEBA_CACHE_DIR:
+            os.makedirs(Config.JIEBA_CACHE_DIR, exist_ok=True)
+            jieba.dt.tmp_dir = Config.JIEBA_CACHE_DIR
+        jieba.initialize()
+
+        if Config.JIEBA_USER_DICT and os.path.exists(Config.JIEBA_USER_DICT):
+            jieba.load_userdict(Config.JIEBA_USER_DICT)
+            print(f"✅ [Tokenizer] User dict loaded: {Config.JIEBA_USER_DICT}")
+
+        self._jieba = jieba
+        self.cache = LRUCache(Config.TOKENIZE_CACHE_SIZE)
+
+    def tokenize(self, text: str) -> str:
+        """返回空格拼接的分词结果，直接喂给 BM25 编码器"""
+        tokens = self.cache.get(text)
+        if tokens is None:
+            tokens = " ".join(self._jieba.cut(text))
+            self.cache.put(text, tokens)
+        return tokens
+
+tokenizer = registry.lazy("tokenizer", Tokenizer)
@@ -0,0 +1,76 @@
+import re
+from typing import Optional
+from config.settings import Config
+from services.cache import LRUCache
+
+_CJK = re.compile(r"[\u3000-\u9fff\uff00-\uffef]")
+_FOOTER_SEP = "\n----------------\n"
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：中日文字符按 1 个 token，其余按 4 个字符 1 个 token (不引入 tokenizer 依赖)"""
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+def _clip_tokens(text: str, budget: int) -> str:
+    if estimate_tokens(text) <= budget:
+        return text
+    # 二分找到不超预算的最长前缀
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if estimate_tokens(text[:mid]) <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[:lo]
+
+
+class ToolOutputStore:
+    """
+    工具输出的旁路存储：完整输出按 tool_call_id 存在进程内 LRU 里 (调试 / 展示用)，
+    写进 messages、发给 LLM 的是按每个工具的 token 预算压缩过的版本。
+    RAG 工具末尾的 "来源" 段 (分隔线之后) 原样保留，Agent 需要在最终回答里引用它。
+    """
+    def __init__(self, maxsize: int, default_budget: int, budgets: dict):
+        self.outputs = LRUCache(maxsize)
+        self.default_budget = default_budget
+        self.budgets = budgets
+        self.tokens_in = 0
+        self.tokens_out = 0
+
+    def budget_for(self, tool_name: str) -> int:
+        return self.budgets.get(tool_name, self.default_budget)
+
+    def compact(self, tool_name: str, tool_call_id: str, content: str) -> str:
+        self.outputs.put(tool_call_id, content)
+        full_tokens = estimate_tokens(content)
+        budget = self.budget_for(tool_name)
+
+        if full_tokens <= budget:
+            compacted = content
+        else:
+            body, sep, footer = content.partition(_FOOTER_SEP)
+            footer = _clip_tokens(footer, budget // 3) if sep else ""
+            body = _clip_tokens(body, max(budget - estimate_tokens(footer), 0))
+            compacted = f"{body}...(已压缩，完整输出约 {full_tokens} tokens){sep}{footer}"
+
+        self.tokens_in += full_tokens
+        self.tokens_out += estimate_tokens(compacted)
+        return compacted
+
+    def get(self, tool_call_id: str) -> Optional[str]:
+        return self.outputs.get(tool_call_id)
+
+    def stats(self) -> dict:
+        return {
+            **self.outputs.stats(),
+            "tokens_in": self.tokens_in,
+            "tokens_out": self.tokens_out,
+        }
+
+
+tool_store = ToolOutputStore(
+    maxsize=Config.TOOL_STORE_SIZE,
+    default_budget=Config.TOOL_TOKEN_BUDGET,
+    budgets=Config.TOOL_TOKEN_BUDGETS,
+)
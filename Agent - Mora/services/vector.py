@@ -1,37 +1,184 @@
-import jieba
-import google.genai as genai
-from pinecone import Pinecone
-from pinecone_text.sparse import BM25Encoder
+import os
+import asyncio
+from collections import Counter
 from typing import List, Dict
+import numpy as np
 from config.settings import Config
+from services.cache import EmbeddingCache, normalize_text
+from services.batcher import MicroBatcher
+from services.bm25_fast import FastBM25Encoder
+from services.tokenizer import tokenizer
+from services.retrieval import PineconeBackend, LocalBackend
+from services.fusion import convex_fuse, rrf_fuse
+from services.registry import registry
 
 class VectorService:
     def __init__(self):
+        # SDK 在这里才 import，import 本模块本身不再有任何开销
+        import google.genai as genai
+
         self.google_client = genai.Client(api_key=Config.GEMINI_KEY)
-        self.pc = Pinecone(api_key=Config.PINECONE_KEY)
-        self.index = self.pc.Index(Config.INDEX_NAME)
-        # 注意：这里需要确保路径存在，或者加个 try-except
-        self.bm25 = BM25Encoder().load(Config.BM25_PATH)
-
-    def embed_query(self, text: str) -> List[float]:
-        res = self.google_client.models.embed_content(
-            model=Config.EMBED_MODEL,
-            contents=text.strip(),
-            config={"task_type": "RETRIEVAL_QUERY"},
-        )
-        return res.embeddings[0].values
-
-    def hybrid_search(self, text: str, dense_vec: List[float], top_k: int = 3) -> List[Dict]:
-        sparse_query = " ".join(jieba.cut(text))
+        self.backend = self._build_backend()
+        if Config.FUSION_MODE != "native" and not self.backend.supports_sparse_only:
+            # 融合检索要单独的 sparse 一路；没有就只剩 dense，关键词类 query 的召回会明显变差
+            print(f"⚠️ [Vector] FUSION_MODE={Config.FUSION_MODE} but no sparse index "
+                  f"(PINECONE_SPARSE_INDEX unset) -> 融合检索降级为只走 dense")
+        # 二进制 BM25 模型 (mmap，多进程共享)；第一次启动会从 JSON 自动转换
+        self.bm25 = FastBM25Encoder.load(Config.BM25_PATH, Config.BM25_BIN_PATH)
+        self.embed_cache = EmbeddingCache(Config.EMBED_MODEL, Config.EMBED_CACHE_SIZE, Config.EMBED_CACHE_PATH)
+        # 并发到达的单条 embedding 请求在这里攒成一次 embed_content 调用
+        self.embed_batcher = MicroBatcher(self.embed_queries, Config.EMBED_BATCH_MAX, Config.EMBED_BATCH_WAIT_MS)
+        # 自适应召回：每次请求最终用了多深的候选集
+        self.recall_depths = Counter()
+        self.recall_escalations = 0
+
+    def _build_backend(self):
+        """RETRIEVAL_BACKEND=local 时用进程内索引，否则走 Pinecone"""
+        if Config.RETRIEVAL_BACKEND == "local":
+            return LocalBackend(Config.LOCAL_INDEX_DIR)
+
+        from pinecone import Pinecone
+        # 整个进程复用同一个 Index 连接池，pool_threads 决定底层 HTTP 连接数
+        self.pc = Pinecone(api_key=Config.PINECONE_KEY, pool_threads=Config.PINECONE_POOL_THREADS)
+        index = self.pc.Index(Config.INDEX_NAME, pool_threads=Config.PINECONE_POOL_THREADS)
+        sparse_index = None
+        if Config.PINECONE_SPARSE_INDEX:
+            sparse_index = self.pc.Index(Config.PINECONE_SPARSE_INDEX, pool_threads=Config.PINECONE_POOL_THREADS)
+        return PineconeBackend(index, timeout=Config.PINECONE_TIMEOUT, sparse_index=sparse_index)
+
+    def kb_fingerprint(self) -> str:
+        """知识库指纹：索引名 / embedding 模型 / BM25 文件 / KB_VERSION 任一变化，语义缓存即失效"""
+        try:
+            st = os.stat(Config.BM25_PATH)
+            bm25_sig = f"{st.st_mtime_ns}:{st.st_size}"
+        except OSError:
+            bm25_sig = "missing"
+        return f"{Config.INDEX_NAME}|{Config.EMBED_MODEL}|{bm25_sig}|{Config.KB_VERSION}|{self.backend.version}"
+
+    def embed_queries(self, texts: List[str]) -> List[np.ndarray]:
+        """
+        批量 embedding (同步)：先查缓存，剩下的去重后按 EMBED_BATCH_MAX 分块调用 embed_content。
+        预热缓存 (warmup_embeddings.py) 直接用这个。
+        """
+        results = [self.embed_cache.get(t) for t in texts]
+        missing = list(dict.fromkeys(normalize_text(t) for t, r in zip(texts, results) if r is None))
+
+        fresh = {}
+        for i in range(0, len(missing), Config.EMBED_BATCH_MAX):
+            chunk = missing[i:i + Config.EMBED_BATCH_MAX]
+            res = self.google_client.models.embed_content(
+                model=Config.EMBED_MODEL,
+                contents=chunk,
+                config={"task_type": "RETRIEVAL_QUERY"},
+            )
+            for t, emb in zip(chunk, res.embeddings):
+                fresh[t] = self.embed_cache.put(t, emb.values)
+
+        return [r if r is not None else fresh[normalize_text(t)] for t, r in zip(texts, results)]
+
+    def embed_query(self, text: str) -> np.ndarray:
+        return self.embed_queries([text])[0]
+
+    async def embed_queries_async(self, texts: List[str]) -> List[np.ndarray]:
+        """异步批量接口：和其他协程的请求一起走微批"""
+        return await self.embed_batcher.submit_many(texts)
+
+    async def embed_query_async(self, text: str) -> np.ndarray:
+        return await self.embed_batcher.submit(text)
+
+    def _encode_sparse(self, text: str) -> Dict:
+        sparse_query = tokenizer.tokenize(text)
         sparse_output = self.bm25.encode_queries([sparse_query])
-        sparse_vec = sparse_output[0] if isinstance(sparse_output, list) else sparse_output
+        return sparse_output[0] if isinstance(sparse_output, list) else sparse_output
+
+    def hybrid_search(self, text: str, dense_vec: List[float], top_k: int = 3,
+                      include_metadata: bool = True) -> List[Dict]:
+        sparse_vec = self._encode_sparse(text)
+        return self.backend.query(dense_vec, sparse_vec, top_k, include_metadata)
+
+    def _sparse_search(self, text: str, top_k: int, include_metadata: bool = True) -> List[Dict]:
+        sparse_vec = self._encode_sparse(text)
+        if not sparse_vec["indices"]:
+            return []
+        return self.backend.query(None, sparse_vec, top_k, include_metadata)
+
+    async def _fused_search(self, text: str, dense_vec: List[float], top_k: int,
+                            include_metadata: bool = True) -> List[Dict]:
+        """
+        dense / sparse 两路并发独立检索，再按 FUSION_MODE 融合打分。
+        后端做不了纯稀疏检索 (Pinecone 没配 sparse 索引) 时跳过 sparse 这一路，只用 dense 一路融合
+        """
+        depth = max(top_k, Config.FUSION_CANDIDATES)
+        if self.backend.supports_sparse_only:
+            dense_matches, sparse_matches = await asyncio.gather(
+                asyncio.to_thread(self.backend.query, dense_vec, None, depth, include_metadata),
+                asyncio.to_thread(self._sparse_search, text, depth, include_metadata),
+            )
+        else:
+            dense_matches = await asyncio.to_thread(self.backend.query, dense_vec, None, depth, include_metadata)
+            sparse_matches = None
+        if Config.FUSION_MODE == "rrf":
+            return rrf_fuse(dense_matches, sparse_matches, Config.RRF_K, top_k)
+        return convex_fuse(dense_matches, sparse_matches, Config.FUSION_ALPHA, top_k)
+
+    async def hybrid_search_async(self, text: str, dense_vec: List[float], top_k: int = 3,
+                                  include_metadata: bool = True) -> List[Dict]:
+        """Pinecone 客户端是同步的，放到线程里跑，避免卡住事件循环"""
+        if Config.FUSION_MODE == "native":
+            return await asyncio.to_thread(self.hybrid_search, text, dense_vec, top_k, include_metadata)
+        return await self._fused_search(text, dense_vec, top_k, include_metadata)
+
+    @staticmethod
+    def _score_spread(docs: List[Dict]) -> float:
+        """头尾分差 / 头部分数：越小说明分数分布越平，第一阶段分不出谁更相关"""
+        if len(docs) < 2:
+            return 1.0
+        top = float(docs[0]["score"])
+        if top <= 0:
+            return 0.0
+        return (top - float(docs[-1]["score"])) / top
+
+    async def adaptive_search_async(self, text: str, dense_vec: List[float],
+                                    with_metadata: bool = True) -> List[Dict]:
+        """
+        自适应召回：先不带 metadata 拿 RECALL_INITIAL_K 条；分数分布太平 (头尾相对分差 < RECALL_FLAT_RATIO)
+        才加深到 RERANK_CANDIDATES 条。最后只给送进 Rerank 的候选补拉 metadata。
+        with_metadata=False 时不拉，调用方决定留下哪些候选后自己调 attach_metadata_async
+        """
+        initial_k = min(Config.RECALL_INITIAL_K, Config.RERANK_CANDIDATES)
+        docs = await self.hybrid_search_async(text, dense_vec, top_k=initial_k, include_metadata=False)
+        spread = self._score_spread(docs)
+
+        # 候选不足 initial_k 说明索引里就这么多，加深也没用
+        escalate = len(docs) >= initial_k and initial_k < Config.RERANK_CANDIDATES and spread < Config.RECALL_FLAT_RATIO
+        if escalate:
+            docs = await self.hybrid_search_async(text, dense_vec, top_k=Config.RERANK_CANDIDATES, include_metadata=False)
+
+        depth = Config.RERANK_CANDIDATES if escalate else initial_k
+        self.recall_depths[depth] += 1
+        self.recall_escalations += escalate
+        print(f"   [Recall] depth={depth} candidates={len(docs)} spread={spread:.3f}"
+              f"{' -> escalated' if escalate else ''}")
+
+        if with_metadata:
+            await self.attach_metadata_async(docs)
+        return docs
+
+    async def attach_metadata_async(self, docs: List[Dict]) -> List[Dict]:
+        """给还没有 metadata 的候选按 id 补拉 (已经带 metadata 的不再请求)"""
+        missing = [d for d in docs if not d.get("metadata")]
+        if missing:
+            metadata = await asyncio.to_thread(self.backend.fetch_metadata, [d["id"] for d in missing])
+            for d in missing:
+                d["metadata"] = metadata.get(d["id"], {})
+        return docs
 
-        res = self.index.query(
-            vector=dense_vec,
-            sparse_vector=sparse_vec,
-            top_k=top_k,
-            include_metadata=True
-        )
-        return res.get("matches", [])
+    def recall_stats(self) -> dict:
+        total = sum(self.recall_depths.values())
+        return {
+            "requests": total,
+            "depths": dict(self.recall_depths),
+            "escalation_rate": round(self.recall_escalations / total, 3) if total else 0.0,
+        }
 
-vec_service = VectorService()
\ No newline at end of file
+vec_service = registry.lazy("vector", VectorService)
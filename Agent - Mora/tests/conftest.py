@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 模块都是按 Agent 根目录的顶层包 import 的 (config / services / tools ...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,85 @@
+"""LLMGateway.call：外部构造的请求 (Agent 的 ChatOpenAI) 也受模型名额限制，限流时按退避重试。"""
+import asyncio
+
+import httpx
+import openai
+import pytest
+
+from config.settings import Config
+from services.gateway import LLMGateway
+
+
+@pytest.fixture(autouse=True)
+def _api_key(monkeypatch):
+    # AsyncOpenAI 构造时要求有 key；请求不会真正发出去
+    monkeypatch.setattr(Config, "ALI_KEY", "test")
+
+
+def _rate_limited() -> openai.RateLimitError:
+    request = httpx.Request("POST", "https://dashscope.test/chat/completions")
+    response = httpx.Response(429, headers={"retry-after-ms": "10"}, request=request)
+    return openai.RateLimitError("rate limited", response=response, body=None)
+
+
+def test_call_retries_rate_limits(monkeypatch):
+    monkeypatch.setattr(Config, "LLM_MAX_RETRIES", 2)
+    gateway = LLMGateway()
+    attempts = []
+
+    async def _request():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise _rate_limited()
+        return "ok"
+
+    async def _run():
+        try:
+            return await gateway.call(Config.LLM_MODEL, _request)
+        finally:
+            await gateway.aclose()
+
+    assert asyncio.run(_run()) == "ok"
+    assert gateway.stats["requests"] == 3
+    assert gateway.stats["retries"] == 2
+    assert gateway.stats["rate_limited"] == 2
+
+
+def test_call_does_not_retry_other_errors():
+    gateway = LLMGateway()
+
+    async def _request():
+        raise RuntimeError("stream broke after the first token")
+
+    async def _run():
+        try:
+            await gateway.call(Config.LLM_MODEL, _request)
+        finally:
+            await gateway.aclose()
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(_run())
+    assert gateway.stats["requests"] == 1
+    assert gateway.stats["failures"] == 1
+
+
+def test_call_holds_a_model_slot(monkeypatch):
+    monkeypatch.setattr(Config, "LLM_CONCURRENCY", {Config.LLM_MODEL: 2})
+    gateway = LLMGateway()
+    running, peak = 0, 0
+
+    async def _request():
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.02)
+        running -= 1
+        return "ok"
+
+    async def _run():
+        try:
+            await asyncio.gather(*(gateway.call(Config.LLM_MODEL, _request) for _ in range(6)))
+        finally:
+            await gateway.aclose()
+
+    asyncio.run(_run())
+    assert peak == 2
@@ -0,0 +1,54 @@
+"""
+node_agent 发给模型的消息：开头只有一条固定的 SystemMessage，强制收尾提示是末尾的 user 消息。
+"""
+import asyncio
+import time
+
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, SystemMessage
+
+from config.settings import Config
+from core.graph import AGENT_SYSTEM_MESSAGE, node_agent
+from services.registry import registry
+
+
+class _FakeModel:
+    def __init__(self):
+        self.sent = None
+
+    async def astream(self, messages):
+        self.sent = messages
+        yield AIMessageChunk(content="请联系 IT 服务台。")
+
+
+class _FakeAgentLLM:
+    def __init__(self):
+        self.with_tools = _FakeModel()
+        self.final = _FakeModel()
+
+
+class _FakeGateway:
+    async def call(self, model, fn):
+        return await fn()
+
+
+def test_forced_final_is_a_trailing_user_message(monkeypatch):
+    llm = _FakeAgentLLM()
+    monkeypatch.setitem(registry._instances, "agent_llm", llm)
+    monkeypatch.setitem(registry._instances, "llm_gateway", _FakeGateway())
+    monkeypatch.setattr(Config, "HISTORY_MAX_TURNS", 1)
+    state = {
+        "messages": [
+            HumanMessage(content="问题 1"), AIMessage(content="回答 1"),
+            HumanMessage(content="问题 2"),
+        ],
+        "tool_rounds": Config.MAX_TOOL_ROUNDS,
+        "turn_started": time.monotonic(),
+    }
+
+    result = asyncio.run(node_agent(state))
+
+    sent = llm.final.sent
+    assert sent[0] is AGENT_SYSTEM_MESSAGE
+    assert not any(isinstance(m, SystemMessage) for m in sent[1:])
+    assert isinstance(sent[-1], HumanMessage) and "不能再调用任何工具" in sent[-1].content
+    assert result["messages"][0].content == "请联系 IT 服务台。"
@@ -0,0 +1,32 @@
+"""
+compact_history：早前轮次压成摘要后，以一问一答的回顾消息对返回，不能是第二条 SystemMessage。
+"""
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from config.settings import Config
+from core.memory import compact_history
+
+
+def _turn(i):
+    return [HumanMessage(content=f"问题 {i}"), AIMessage(content=f"回答 {i}")]
+
+
+def test_summary_is_a_recap_pair(monkeypatch):
+    monkeypatch.setattr(Config, "HISTORY_MAX_TURNS", 1)
+    messages = _turn(1) + _turn(2) + [HumanMessage(content="问题 3")]
+
+    recap, compacted = compact_history(messages)
+
+    assert [type(m) for m in recap] == [HumanMessage, AIMessage]
+    assert "问题 1" in recap[0].content and "回答 2" in recap[0].content
+    assert not any(isinstance(m, SystemMessage) for m in recap + compacted)
+    assert [m.content for m in compacted] == ["问题 3"]
+
+
+def test_short_history_has_no_recap(monkeypatch):
+    monkeypatch.setattr(Config, "HISTORY_MAX_TURNS", 5)
+
+    recap, compacted = compact_history(_turn(1) + [HumanMessage(content="问题 2")])
+
+    assert recap == []
+    assert len(compacted) == 3
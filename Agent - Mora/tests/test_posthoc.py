@@ -0,0 +1,42 @@
+"""后台阅卷：只有明确通过才执行 on_approved (写语义缓存)；阅卷失败不算通过。"""
+import asyncio
+
+from services.posthoc import PosthocGrader
+
+
+async def _grade(result=None, error=None):
+    await asyncio.sleep(0)
+    if error is not None:
+        raise error
+    return result
+
+
+def _run(grade):
+    grader = PosthocGrader()
+    approved, rejected = [], []
+    grader.add_hook(rejected.append)
+
+    async def _main():
+        grader.submit("VPN 连不上", "请重启电脑。", grade, on_approved=lambda: approved.append(True))
+        await grader.drain()
+
+    asyncio.run(_main())
+    return grader, approved, rejected
+
+
+def test_approved_answer_is_cached():
+    grader, approved, rejected = _run(_grade({"score": "yes"}))
+    assert approved == [True] and rejected == []
+    assert grader.paths["posthoc_approved"] == 1
+
+
+def test_grader_failure_is_not_approved():
+    grader, approved, rejected = _run(_grade(error=TimeoutError("grader timed out")))
+    assert approved == [] and rejected == []
+    assert grader.paths["posthoc_error"] == 1
+
+
+def test_missing_score_is_not_approved():
+    grader, approved, rejected = _run(_grade({"reason": "?"}))
+    assert approved == []
+    assert grader.paths["posthoc_approved"] == 0
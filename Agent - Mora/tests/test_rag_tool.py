@@ -0,0 +1,134 @@
+"""
+RAG 工具不能卡住事件循环：两次并发的 lookup_internal_knowledge 总耗时应接近一次，而不是两次。
+embedding / 检索 / Rerank 模型都换成固定耗时的替身；Rerank 走真实的 RerankService.rerank
+(分数缓存 + 动态批 + 专用线程池)，只把模型的 predict 换成阻塞 sleep。
+"""
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from config.settings import Config
+from services.batcher import MicroBatcher
+from services.cache import ScoreCache
+from services.registry import registry
+from services.rerank import RerankService
+from tools.rag_tool import lookup_internal_knowledge
+
+DELAY = 0.2
+
+
+class _FakeVectorService:
+    async def embed_query_async(self, text):
+        await asyncio.sleep(DELAY)
+        return np.full(8, 0.1, dtype=np.float32)
+
+    async def hybrid_search_async(self, text, dense_vec, top_k=3, include_metadata=True):
+        # 模拟同步的 Pinecone 客户端：阻塞调用放在线程里
+        await asyncio.to_thread(time.sleep, DELAY)
+        return [
+            {"id": f"{text}-{i}", "score": 0.5 - i * 0.01, "metadata": {"name": f"doc {i}", "steps": "重启电脑"}}
+            for i in range(5)
+        ]
+
+    async def attach_metadata_async(self, docs):
+        return docs
+
+    def kb_fingerprint(self):
+        return "test"
+
+
+class _SlowModel:
+    name = "fake"
+
+    def predict(self, pairs, batch_size=32):
+        time.sleep(DELAY)  # CPU 推理：阻塞当前 rerank 线程
+        return np.full(len(pairs), 3.0)
+
+
+class _FakeLLMService:
+    async def generate(self, system_prompt, user_prompt, temp=0.2):
+        await asyncio.sleep(0.01)
+        return "请重启电脑。"
+
+    async def grade_answer(self, text, prompt):
+        return {"score": "yes"}
+
+
+def _rerank_service(executor):
+    service = RerankService.__new__(RerankService)  # 跳过 __init__，不加载 torch / 模型
+    service.model_name = "fake"
+    service.model = _SlowModel()
+    service.executor = executor
+    service.batcher = MicroBatcher(service._predict_batch, Config.RERANK_MAX_BATCH, 5, executor=executor)
+    service.score_cache = ScoreCache(100)
+    return service
+
+
+@pytest.fixture
+def stub_services(monkeypatch):
+    executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="rerank")
+    monkeypatch.setitem(registry._instances, "vector", _FakeVectorService())
+    monkeypatch.setitem(registry._instances, "rerank", _rerank_service(executor))
+    monkeypatch.setitem(registry._instances, "llm", _FakeLLMService())
+    monkeypatch.setattr(Config, "ADAPTIVE_RECALL", False)
+    monkeypatch.setattr(Config, "FAST_PATH_ENABLED", False)
+    monkeypatch.setattr(Config, "SEMANTIC_CACHE_ENABLED", False)
+    yield
+    executor.shutdown(wait=True)
+
+
+def test_concurrent_lookups_overlap(stub_services):
+    async def _run():
+        start = time.perf_counter()
+        single = await lookup_internal_knowledge.ainvoke({"query": "VPN 连不上"})
+        one = time.perf_counter() - start
+
+        # 换不同的 query，避免命中 Rerank 分数缓存
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            lookup_internal_knowledge.ainvoke({"query": "Outlook 打不开"}),
+            lookup_internal_knowledge.ainvoke({"query": "打印机脱机"}),
+        )
+        two = time.perf_counter() - start
+        return single, results, one, two
+
+    single, results, one, two = asyncio.run(_run())
+
+    assert single.startswith("【知识库结果】")
+    assert all(r.startswith("【知识库结果】") for r in results)
+    # 串行至少要 2 * 3 * DELAY；并发时应接近一次调用
+    assert one >= 3 * DELAY
+    assert two < 1.5 * one, f"two concurrent calls took {two:.2f}s, a single call {one:.2f}s"
+
+
+def test_skipped_rerank_is_not_labelled_bge(stub_services, monkeypatch):
+    from services.posthoc import posthoc
+
+    monkeypatch.setattr(Config, "FAST_PATH_ENABLED", True)
+    monkeypatch.setattr(Config, "RERANK_SKIP_ENABLED", True)
+    monkeypatch.setattr(Config, "RERANK_SKIP_SCORE", 0.4)
+    monkeypatch.setattr(Config, "RERANK_SKIP_MARGIN", 0.0)
+
+    async def _run():
+        result = await lookup_internal_knowledge.ainvoke({"query": "VPN 连不上"})
+        await posthoc.drain()
+        return result
+
+    result = asyncio.run(_run())
+
+    assert "粗排精选来源" in result
+    assert "BGE" not in result
+
+
+def test_empty_rerank_result_is_no_result(stub_services, monkeypatch):
+    async def _no_docs(query, docs, top_k=5):
+        return []
+
+    monkeypatch.setattr(registry._instances["rerank"], "rerank", _no_docs)
+
+    result = asyncio.run(lookup_internal_knowledge.ainvoke({"query": "VPN 连不上"}))
+
+    assert result.startswith("【无结果】")
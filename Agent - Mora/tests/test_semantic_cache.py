@@ -0,0 +1,44 @@
+"""语义缓存：最像的那条过期时，继续命中其他超过阈值的有效条目。"""
+import time
+
+import numpy as np
+
+from services.semantic_cache import SemanticCache
+
+
+def test_expired_best_match_falls_through_to_next_valid_entry():
+    cache = SemanticCache(threshold=0.9, max_entries=10, ttl=0.1, max_bytes=1 << 20)
+    query = np.ones(8, dtype=np.float32)
+    near = query.copy()
+    near[0] = 0.9
+
+    cache.put(query, "旧答案", "kb")
+    time.sleep(0.15)
+    cache.put(near, "新答案", "kb")
+
+    answer, _, sim = cache.lookup(query, "kb")
+    assert answer == "新答案" and sim >= 0.9
+    assert cache.evictions == 1
+    assert cache.stats()["entries"] == 1
+
+
+def test_all_expired_is_a_miss():
+    cache = SemanticCache(threshold=0.9, max_entries=10, ttl=0.05, max_bytes=1 << 20)
+    query = np.ones(8, dtype=np.float32)
+    cache.put(query, "旧答案", "kb")
+    time.sleep(0.1)
+
+    assert cache.lookup(query, "kb") is None
+    assert cache.misses == 1 and cache.stats()["entries"] == 0
+
+
+def test_score_cache_ignores_other_model(tmp_path):
+    from services.cache import ScoreCache
+
+    path = str(tmp_path / "scores.json")
+    cache = ScoreCache(10, path, namespace="bge|torch")
+    cache.put("k", 0.5)
+    cache.save()
+
+    assert ScoreCache(10, path, namespace="bge|torch").get("k") == 0.5
+    assert ScoreCache(10, path, namespace="bge|onnx").get("k") is None
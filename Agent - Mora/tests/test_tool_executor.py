@@ -0,0 +1,60 @@
+"""ToolExecutor：单个工具的超时不能超过本轮剩余的时间预算，排队等名额的时间也算在内。"""
+import time
+import asyncio
+
+from core.tool_executor import ToolExecutor
+
+
+class _SlowTool:
+    name = "slow"
+
+    async def ainvoke(self, args):
+        await asyncio.sleep(args["seconds"])
+        return "done"
+
+
+def _executor() -> ToolExecutor:
+    return ToolExecutor([_SlowTool()], default_timeout=5.0, timeouts={}, default_concurrency=4, concurrency={})
+
+
+def test_remaining_budget_caps_tool_timeout():
+    executor = _executor()
+    call = {"name": "slow", "args": {"seconds": 2.0}, "id": "1"}
+
+    start = time.perf_counter()
+    [result] = asyncio.run(executor.run([call], {}, budget=0.2))
+    elapsed = time.perf_counter() - start
+
+    assert result["status"] == "error"
+    assert elapsed < 1.0
+    assert executor.stats["timeouts"] == 1
+    assert executor.stats["budget_capped"] == 1
+
+
+def test_no_budget_uses_tool_timeout():
+    executor = _executor()
+    call = {"name": "slow", "args": {"seconds": 0.05}, "id": "1"}
+
+    [result] = asyncio.run(executor.run([call], {}))
+
+    assert result["status"] == "success" and result["content"] == "done"
+    assert executor.stats["budget_capped"] == 0
+
+
+def test_waiting_for_a_slot_counts_against_the_timeout():
+    executor = _executor()
+    call = {"name": "slow", "args": {"seconds": 0.01}, "id": "1"}
+
+    async def _run():
+        # 名额被别的会话占满，一直不释放
+        for _ in range(4):
+            await executor._slots["slow"].acquire()
+        return await executor.run([call], {}, budget=0.2)
+
+    start = time.perf_counter()
+    [result] = asyncio.run(_run())
+    elapsed = time.perf_counter() - start
+
+    assert result["status"] == "error"
+    assert elapsed < 1.0
+    assert executor.stats["timeouts"] == 1
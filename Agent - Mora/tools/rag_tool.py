@@ -6,6 +6,8 @@ from services.llm import llm_service
 from services.notification import notification_service
 # 引入刚才写的服务
 from services.rerank import rerank_service 
+from services.semantic_cache import semantic_cache
+from services.posthoc import posthoc
 
 @tool
 async def lookup_internal_knowledge(query: str) -> str:
@@ -20,9 +22,34 @@ async def lookup_internal_knowledge(query: str) -> str:
     # ---------------------------------------------------
     try:
         # 假设 top_k 设为 50，确保包含正确答案
-        dense_vec = vec_service.embed_query(query)
-        # 注意：这里我们拿 50 条，给重排序模型去挑
-        rough_docs = vec_service.hybrid_search(query, dense_vec, top_k=50)
+        dense_vec = await vec_service.embed_query_async(query)
+
+        # 语义缓存：相似问题已有通过阅卷的答案，直接返回，跳过检索/重排/生成/阅卷
+        if Config.SEMANTIC_CACHE_ENABLED:
+            fingerprint = vec_service.kb_fingerprint()
+            hit = semantic_cache.lookup(dense_vec, fingerprint)
+            if hit is not None:
+                cached_output, _, sim = hit
+                print(f"   [Cache] ⚡ Semantic hit (sim={sim:.4f}) -> skip RAG")
+                return cached_output
+
+        # 注意：最多拿 RERANK_CANDIDATES 条 (默认 50)，给重排序模型去挑
+        # 融合模式 (FUSION_MODE=convex/rrf) 下召回更准，可以调小以节省 Rerank 开销
+        if Config.ADAPTIVE_RECALL:
+            # 简单问题只召回 RECALL_INITIAL_K 条，分数拉不开时才加深；metadata 等决定要不要 Rerank 之后再拉
+            rough_docs = await vec_service.adaptive_search_async(query, dense_vec, with_metadata=False)
+        else:
+            rough_docs = await vec_service.hybrid_search_async(query, dense_vec, top_k=Config.RERANK_CANDIDATES)
+
+        # 快速通道：粗排 Top1 足够高且和 Top2 拉得开，重排也不会改变结论，直接跳过
+        s1 = float(rough_docs[0].get("score", 0.0)) if rough_docs else 0.0
+        s2 = float(rough_docs[1].get("score", 0.0)) if len(rough_docs) > 1 else 0.0
+        skip_rerank = (Config.FAST_PATH_ENABLED and Config.RERANK_SKIP_ENABLED
+                       and s1 >= Config.RERANK_SKIP_SCORE and (s1 - s2) >= Config.RERANK_SKIP_MARGIN)
+        if skip_rerank:
+            # 跳过 Rerank 时只有前 TOP_K 条会用到，只给它们补拉 metadata
+            rough_docs = rough_docs[:Config.TOP_K]
+        rough_docs = await vec_service.attach_metadata_async(rough_docs)
     except Exception as e:
         error_msg = f"Vector DB Error: {str(e)}"
         print(f"❌ {error_msg}")
@@ -43,14 +70,25 @@ async def lookup_internal_knowledge(query: str) -> str:
     # ---------------------------------------------------
     # 2. 精排 (Rerank) - BGE 登场
     # ---------------------------------------------------
-    try:
-        # 这里的 Config.TOP_K 依然是你最终想给 LLM 看的数量 (比如 5)
-        final_docs = await rerank_service.rerank(query, rough_docs, top_k=Config.TOP_K)
-        print(f"   [Rerank] {len(rough_docs)} -> {len(final_docs)} docs sorted by BGE.")
-    except Exception as e:
-        print(f"⚠️ Rerank Error: {e}, fallback to top {Config.TOP_K} raw results.")
-        # 降级策略：如果显存爆了或者报错，直接截取粗排结果
+    score_label = "Raw Score" if skip_rerank else "BGE Score"
+    source_title = "粗排精选来源" if skip_rerank else "BGE精选来源"
+    bge_scored = False
+
+    if skip_rerank:
         final_docs = rough_docs[:Config.TOP_K]
+        posthoc.record("rerank_skipped")
+        print(f"   [Rerank] ⏩ Unambiguous recall (Top1={s1:.4f}, Margin={s1 - s2:.4f}) -> skip BGE")
+    else:
+        posthoc.record("reranked")
+        try:
+            # 这里的 Config.TOP_K 依然是你最终想给 LLM 看的数量 (比如 5)
+            final_docs = await rerank_service.rerank(query, rough_docs, top_k=Config.TOP_K)
+            bge_scored = True
+            print(f"   [Rerank] {len(rough_docs)} -> {len(final_docs)} docs sorted by BGE.")
+        except Exception as e:
+            print(f"⚠️ Rerank Error: {e}, fallback to top {Config.TOP_K} raw results.")
+            # 降级策略：如果显存爆了或者报错，直接截取粗排结果
+            final_docs = rough_docs[:Config.TOP_K]
 
     # ---------------------------------------------------
     # 3. 结果展示与门控
@@ -59,8 +97,8 @@ async def lookup_internal_knowledge(query: str) -> str:
     for i, doc in enumerate(final_docs):
         score = doc.get("score", 0.0)
         name = doc.get("metadata", {}).get("name", "Unknown")
-        # 打印 BGE 打分结果
-        source_info_list.append(f"[{i+1}] {name} (BGE Score: {score:.4f})")
+        # 打印 BGE 打分结果 (跳过 Rerank 时是粗排原始分)
+        source_info_list.append(f"[{i+1}] {name} ({score_label}: {score:.4f})")
     
     source_display_str = "\n".join(source_info_list)
     print(f"   [Sources]\n{source_display_str}")
@@ -68,8 +106,10 @@ async def lookup_internal_knowledge(query: str) -> str:
     # BGE 的 Sigmoid 分数通常非常两极分化
     # 相关的一般 > 0.8，不相关的一般 < 0.1
     # 建议 Config.SCORE_FLOOR 设为 0.35 左右比较安全
-    if not final_docs or float(final_docs[0]['score']) < Config.SCORE_FLOOR:
-         return f"【无结果】文档相关度不足 (最高分: {final_docs[0]['score']:.2f})。\n\n📊 **参考文档：**\n{source_display_str}"
+    if not final_docs:
+        return "【无结果】知识库中未找到相关文档。"
+    if float(final_docs[0]['score']) < Config.SCORE_FLOOR:
+        return f"【无结果】文档相关度不足 (最高分: {final_docs[0]['score']:.2f})。\n\n📊 **参考文档：**\n{source_display_str}"
 
     # ---------------------------------------------------
     # 4. 生成 (Generation)
@@ -86,15 +126,32 @@ async def lookup_internal_knowledge(query: str) -> str:
     except Exception as e:
         return "【生成故障】答案生成失败。"
 
+    final_output = f"{answer}\n\n----------------\n📊 **{source_title}：**\n{source_display_str}"
+    grader_input = f"【文档】\n{context}\n\n【答案】\n{answer}"
+
     # 5. 阅卷
-    grade = await llm_service.route_request(
-        f"【文档】\n{context}\n\n【答案】\n{answer}", 
-        Prompts.SYSTEM_GRADER
-    )
-    
-    final_output = f"{answer}\n\n----------------\n📊 **BGE精选来源：**\n{source_display_str}"
+    # 快速通道：文档分数没有歧义时先把答案交给 Agent，阅卷在后台跑，不通过由 posthoc 的修正钩子处理
+    if Config.FAST_PATH_ENABLED and (skip_rerank or (bge_scored and float(final_docs[0]['score']) >= Config.ASYNC_GRADE_SCORE)):
+        posthoc.record("graded_async")
+        result = f"【知识库结果】\n{final_output}"
+        on_approved = (lambda: semantic_cache.put(dense_vec, result, fingerprint)) if Config.SEMANTIC_CACHE_ENABLED else None
+        posthoc.submit(query, answer, llm_service.grade_answer(grader_input, Prompts.SYSTEM_GRADER), on_approved)
+        print("   [Grader] ⏩ Fast path -> grading in background")
+        return result
 
-    if grade.get("score") == "yes":
+    posthoc.record("graded_sync")
+    try:
+        grade = await llm_service.grade_answer(grader_input, Prompts.SYSTEM_GRADER)
+    except Exception as e:
+        # 阅卷挂了：答案照常给 Agent，但没阅过卷的答案不写语义缓存
+        print(f"   [Grader] ⚠️ Grader failed ({e}) -> answer kept, not cached")
+        posthoc.record("grader_error")
         return f"【知识库结果】\n{final_output}"
+
+    if grade["score"] == "yes":
+        result = f"【知识库结果】\n{final_output}"
+        if Config.SEMANTIC_CACHE_ENABLED:
+            semantic_cache.put(dense_vec, result, fingerprint)
+        return result
     else:
         return f"【幻觉警告】生成的回答可能不准确。\n{final_output}"
\ No newline at end of file
@@ -5,7 +5,7 @@ from services.notification import notification_service # 👈 引入报警
 import traceback
 
 @tool
-def search_internet(query: str) -> str:
+async def search_internet(query: str) -> str:
     """
     当内部知识库(lookup_internal_knowledge)无法解决问题，或者用户明确要求查询外部信息时调用。
     用于查询互联网上的最新技术文档、解决方案或新闻。
@@ -13,8 +13,8 @@ def search_internet(query: str) -> str:
     print(f"\n🌍 [Tool Call] Web Search: {query}")
     
     try:
-        # 1. 调用搜索服务
-        result = search_service.web_search(query)
+        # 1. 调用搜索服务 (原生异步，不再阻塞 Agent 的事件循环)
+        result = await search_service.web_search_async(query)
         
         # 2. 处理空结果
         if not result:
@@ -30,7 +30,7 @@ def search_internet(query: str) -> str:
         
         # 🔥 3. 触发报警 (核心部分)
         # 搜索挂了通常意味着 API Key 额度用完，或者 Tavily 服务宕机，必须要知道
-        notification_service.send_alert(
+        await notification_service.send_alert_async(
             module_name="Search_Tool_Tavily",
             error_msg=error_str,
             detail=f"Query: {query}\nTraceback:\n{traceback.format_exc()}"